@@ -0,0 +1,118 @@
+# Hot/cold partitioning: old and closed leads move to an attached archive database
+#
+# Every connection attaches the location's archive file as "archive". Moving a chunk
+# takes two short write transactions: copy it into archive.leads, then delete it from
+# the hot table. With WAL, a transaction spanning both files is only atomic per file,
+# so the delete only removes rows whose archived copy is current (same version); a row
+# changed in between stays hot and is copied again next time. Reads that include the
+# archive skip archived rows that are still hot, so nothing is ever seen twice.
+
+import asyncio
+import time
+from schema import add_column, schedule_backfill
+from stats import keep_archived_counts
+
+def hot_columns(conn):
+    # (name, type) of stored columns; generated ones (hidden 2 or 3) are not copied
+    return [(r[1], r[2]) for r in conn.execute("PRAGMA main.table_xinfo(leads)") if r[6] not in (2, 3)]
+
+def create_archive(conn):
+    # Idempotent, and run again before an archival pass when archive_stale says so, so the
+    # archive follows columns added to the hot table by later migrations (or starts over
+    # if the file was replaced)
+    conn.execute("CREATE TABLE IF NOT EXISTS archive.leads (id INTEGER PRIMARY KEY)")
+    existing = {r[1] for r in conn.execute("PRAGMA archive.table_xinfo(leads)")}
+    for name, type_ in hot_columns(conn):
+        if name not in existing:
+            conn.execute(f"ALTER TABLE archive.leads ADD COLUMN {name} {type_}")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_archive_created_ts ON leads (created_ts)")
+
+def create_retention(conn):
+    add_column(conn, "leads", "created_ts INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_created_ts ON leads (created_ts)")
+    # Closed leads leave the hot table soon, so this index stays tiny
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_closed ON leads (created_ts) WHERE status = 'closed'")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            active INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO archive_state (id, active) VALUES (1, 0)")
+    keep_archived_counts(conn)
+    schedule_backfill(conn, "created_ts")
+    create_archive(conn)
+
+def fill_created_ts(conn, after_id, until_id):
+    # created_at is local time, as is datetime.timestamp() for new rows (leads.epoch)
+    conn.execute("""
+        UPDATE leads SET created_ts = CAST(strftime('%s', created_at, 'utc') AS INTEGER)
+        WHERE id > ? AND id <= ? AND created_ts IS NULL
+    """, (after_id, until_id))
+
+def archive_stale(conn):
+    # True when create_archive has work to do; cheap enough for a reader before each pass
+    existing = {r[1] for r in conn.execute("PRAGMA archive.table_xinfo(leads)")}
+    return any(name not in existing for name, _ in hot_columns(conn))
+
+def due_ids(conn, before_ts, closed_before_ts, size):
+    # Waits for pending backfills: they count and index rows by id range, and would
+    # miss rows that had already moved
+    if conn.execute("SELECT 1 FROM backfills LIMIT 1").fetchone():
+        return []
+    return [r[0] for r in conn.execute("""
+        SELECT id FROM leads INDEXED BY idx_leads_created_ts WHERE created_ts < ?
+        UNION
+        SELECT id FROM leads INDEXED BY idx_leads_closed WHERE status = 'closed' AND created_ts < ?
+        LIMIT ?
+    """, (before_ts, closed_before_ts, size))]
+
+def copy_chunk(conn, before_ts, closed_before_ts, size):
+    ids = due_ids(conn, before_ts, closed_before_ts, size)
+    if not ids:
+        return None
+    cols = ", ".join(name for name, _ in hot_columns(conn))
+    conn.execute(f"""
+        INSERT OR REPLACE INTO archive.leads ({cols})
+        SELECT {cols} FROM main.leads WHERE id IN ({", ".join("?" * len(ids))})
+    """, ids)
+    return ids
+
+def purge_chunk(conn, ids):
+    # archive_state.active tells the lead_stats trigger that these rows are moving,
+    # not going away; the FTS trigger still drops them from the (hot-only) search index
+    conn.execute("UPDATE archive_state SET active = 1 WHERE id = 1")
+    deleted = conn.execute(f"""
+        DELETE FROM main.leads
+        WHERE id IN ({", ".join("?" * len(ids))})
+          AND version = (SELECT a.version FROM archive.leads a WHERE a.id = leads.id)
+    """, ids).rowcount
+    conn.execute("UPDATE archive_state SET active = 0 WHERE id = 1")
+    return deleted
+
+def cutoffs(days, closed_days):
+    # 0 days turns that rule off (NULL never compares true)
+    now = time.time()
+    return (int(now - days * 86400) if days else None,
+            int(now - closed_days * 86400) if closed_days else None)
+
+async def run_archival(db, days, closed_days, chunk=500, pause=0.05):
+    # One pass; main.maintain repeats it every ARCHIVE_INTERVAL_SECONDS. Usually nothing
+    # is due, which a reader can tell without the write lock.
+    if not days and not closed_days:
+        return
+    if await db.read(archive_stale):
+        await db.write(create_archive)
+    if not await db.read(due_ids, *cutoffs(days, closed_days), 1):
+        return
+    while (ids := await db.write(copy_chunk, *cutoffs(days, closed_days), chunk)) is not None:
+        await db.write(purge_chunk, ids)
+        # Intake gets the writer between chunks
+        await asyncio.sleep(pause)
+
+def run_archival_sync(db, days, closed_days, chunk=5000):
+    db.write_sync(create_archive)
+    moved = 0
+    while (ids := db.write_sync(copy_chunk, *cutoffs(days, closed_days), chunk)) is not None:
+        moved += db.write_sync(purge_chunk, ids)
+    return moved
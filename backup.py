@@ -0,0 +1,227 @@
+# Online backups: point-in-time snapshots of a location's databases while intake keeps writing
+#
+# Copies go through SQLite's backup API a batch of pages per step, sleeping between steps
+# so the copy never hogs the disk. The source connection holds one read transaction for
+# the whole copy. Under WAL that never blocks writers, and it pins the snapshot: commits
+# made meanwhile neither restart the backup (as they otherwise would) nor leak into it.
+#
+# A snapshot is a directory <BACKUP_DIR>/<location>/<UTC stamp>/ holding leads.db and
+# archive.db. It is built under a unique .partial name, checked, then renamed, so
+# anything without that suffix is complete. An exclusive lock on <location>/.lock lets
+# only one process copy a location at a time.
+
+import asyncio
+import fcntl
+import logging
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+log = logging.getLogger("leads.backup")
+
+STAMP = "%Y%m%dT%H%M%SZ"
+
+class BackupError(Exception):
+    pass
+
+def copy_database(source, dest, pages=128, pause=0.02):
+    src = sqlite3.connect(source, isolation_level=None)
+    dst = sqlite3.connect(dest, isolation_level=None)
+    try:
+        src.execute("PRAGMA busy_timeout = 5000")
+        src.execute("BEGIN")
+        src.execute("SELECT count(*) FROM sqlite_master").fetchone()
+        # The progress callback runs between steps; sleeping there lets writers and
+        # checkpoints have the disk
+        src.backup(dst, pages=pages, progress=lambda status, remaining, total: time.sleep(pause))
+        src.execute("COMMIT")
+        # A snapshot is one self-contained file, without -wal and -shm companions
+        dst.execute("PRAGMA journal_mode = DELETE")
+    finally:
+        src.close()
+        dst.close()
+
+def verify_database(path, quick=False):
+    # Problems found, empty when the file is sound
+    try:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    except sqlite3.Error as e:
+        return [str(e)]
+    try:
+        rows = [r[0] for r in conn.execute("PRAGMA quick_check" if quick else "PRAGMA integrity_check")]
+        return [] if rows == ["ok"] else rows
+    except sqlite3.DatabaseError as e:
+        return [str(e)]
+    finally:
+        conn.close()
+
+def describe_database(path):
+    # (schema version, leads) for reports
+    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    try:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        try:
+            leads = conn.execute("SELECT count(*) FROM leads").fetchone()[0]
+        except sqlite3.OperationalError:
+            leads = 0
+        return version, leads
+    finally:
+        conn.close()
+
+@contextmanager
+def snapshot_lock(directory, wait=True):
+    # Yields whether the lock was taken; with wait=False it is not waited for. Released
+    # by the OS if the process dies, so a crash never leaves it stuck.
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, ".lock"), "a") as f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX if wait else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        yield True
+
+def build_snapshot(db_path, archive_path, directory, pages=128, pause=0.02):
+    # Caller holds snapshot_lock. Stamps have one-second resolution, so one taken right
+    # after another waits for the next second rather than reuse its name.
+    stamp = time.strftime(STAMP, time.gmtime())
+    while os.path.exists(os.path.join(directory, stamp)):
+        time.sleep(0.1)
+        stamp = time.strftime(STAMP, time.gmtime())
+    partial = tempfile.mkdtemp(prefix=stamp + ".", suffix=".partial", dir=directory)
+    try:
+        # Hot file first: a lead archived in between is then in both copies (archive reads
+        # skip rows that are still hot), never in neither
+        copy_database(db_path, os.path.join(partial, "leads.db"), pages, pause)
+        if os.path.exists(archive_path):
+            copy_database(archive_path, os.path.join(partial, "archive.db"), pages, pause)
+        for name in sorted(os.listdir(partial)):
+            problems = verify_database(os.path.join(partial, name), quick=True)
+            if problems:
+                raise BackupError(f"{name} failed its check: {problems[0]}")
+        final = os.path.join(directory, stamp)
+        os.rename(partial, final)
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+    return final
+
+def take_snapshot(db_path, archive_path, directory, pages=128, pause=0.02):
+    # Waits for a snapshot of this location that another process is writing
+    with snapshot_lock(directory):
+        return build_snapshot(db_path, archive_path, directory, pages, pause)
+
+def snapshot_if_due(db_path, archive_path, directory, interval, keep, pages=128, pause=0.02):
+    # Workers sharing BACKUP_DIR all try at once; one takes the lock and copies, and the
+    # others return None, then find its snapshot fresh. Checked again under the lock, so
+    # a worker that gets it just after another one finished copies nothing.
+    with snapshot_lock(directory, wait=False) as locked:
+        if not locked or backup_due(directory, interval):
+            return None
+        path = build_snapshot(db_path, archive_path, directory, pages, pause)
+        prune(directory, *keep)
+        return path
+
+def snapshot_time(name):
+    return datetime.strptime(name, STAMP).replace(tzinfo=timezone.utc)
+
+def snapshots(directory):
+    # Complete snapshots, newest first
+    if not os.path.isdir(directory):
+        return []
+    names = []
+    for name in os.listdir(directory):
+        try:
+            snapshot_time(name)
+        except ValueError:
+            continue
+        names.append(name)
+    return sorted(names, reverse=True)
+
+def retained(names, keep_last, keep_daily, keep_weekly):
+    # The keep_last newest, plus the newest of each of the last keep_daily days and
+    # keep_weekly ISO weeks that have a snapshot
+    keep = set(names[:keep_last])
+    for count, period in ((keep_daily, lambda t: t.date()), (keep_weekly, lambda t: t.isocalendar()[:2])):
+        seen = set()
+        for name in names:
+            p = period(snapshot_time(name))
+            if p not in seen:
+                if len(seen) == count:
+                    break
+                seen.add(p)
+                keep.add(name)
+    return keep
+
+def prune(directory, keep_last=4, keep_daily=7, keep_weekly=4):
+    names = snapshots(directory)
+    keep = retained(names, keep_last, keep_daily, keep_weekly)
+    removed = [n for n in names if n not in keep]
+    for name in removed:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    # Leftovers of copies that died part way; a day old, so never one still being written
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".partial") and time.time() - os.path.getmtime(path) > 86400:
+            shutil.rmtree(path, ignore_errors=True)
+    return removed
+
+def restore_snapshot(snapshot, db_path, archive_path, pages=1024):
+    # Writes through the backup API under the live files' write lock, so a reader sees
+    # the old database or the new one, never a mix. Stop the app first anyway: its
+    # feed, ETags and outbox wake-ups assume the database only moves forward.
+    files = [("leads.db", db_path), ("archive.db", archive_path)]
+    for name, _ in files:
+        path = os.path.join(snapshot, name)
+        if os.path.exists(path):
+            problems = verify_database(path)
+            if problems:
+                raise BackupError(f"{path} failed its check: {problems[0]}")
+        elif name == "leads.db":
+            raise BackupError(f"{path} is missing")
+    for name, target in files:
+        path = os.path.join(snapshot, name)
+        if os.path.exists(path):
+            src = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            dst = sqlite3.connect(target, isolation_level=None)
+            try:
+                dst.execute("PRAGMA busy_timeout = 5000")
+                src.backup(dst, pages=pages)
+            finally:
+                src.close()
+                dst.close()
+
+def backup_due(directory, interval):
+    # Seconds until the next snapshot; the newest one on disk counts, so restarts and
+    # several workers sharing BACKUP_DIR (see snapshot_if_due) don't pile up extra copies
+    names = snapshots(directory)
+    if not names:
+        return 0
+    age = (datetime.now(timezone.utc) - snapshot_time(names[0])).total_seconds()
+    return max(0, interval - age)
+
+async def run_backups(db_path, archive_path, directory, interval, keep=(4, 7, 4), pages=128, pause=0.02,
+                      on_success=None):
+    while True:
+        wait = backup_due(directory, interval)
+        if wait:
+            await asyncio.sleep(wait)
+            continue
+        started = time.time()
+        try:
+            path = await asyncio.to_thread(snapshot_if_due, db_path, archive_path, directory, interval, keep, pages,
+                                           pause)
+        except (OSError, sqlite3.Error, BackupError):
+            log.exception("backup of %s failed", db_path)
+            await asyncio.sleep(min(interval, 600))
+            continue
+        if path is None:
+            # Another process is copying this location
+            await asyncio.sleep(min(interval, 60))
+            continue
+        if on_success is not None:
+            on_success(path, time.time() - started)
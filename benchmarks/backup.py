@@ -0,0 +1,124 @@
+# Intake latency while a backup runs against a large database
+#
+#   python benchmarks/backup.py --size-mb 2048 --rate 200
+#
+# Submits leads at a steady rate and reports latency with no backup running, during an
+# online snapshot (backup.take_snapshot), and during a plain file copy made while holding
+# the write lock, which is what a "safe" cp of leads.db amounts to. The database is padded
+# to --size-mb with a ballast table: the backup copies pages, whatever table they hold.
+
+import argparse
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEAD = {"name": "Bench Customer", "email": None, "vehicle": "2016 Toyota Camry", "urgency": "Soon",
+        "issues": "Grinding noise when braking", "contact_method": "Call", "contact_time": "Morning",
+        "intent": "Ready to schedule"}
+
+def pad(conn, size_mb):
+    conn.execute("CREATE TABLE IF NOT EXISTS bench_ballast (id INTEGER PRIMARY KEY, data BLOB)")
+    rows = size_mb * 1024 // 64
+    for start in range(0, rows, 4096):
+        conn.executemany("INSERT INTO bench_ballast (data) VALUES (randomblob(65536))",
+                         [()] * min(4096, rows - start))
+        conn.execute("COMMIT")
+        conn.execute("BEGIN IMMEDIATE")
+
+def copy_under_lock(conn, path, dest):
+    # Holding the write lock keeps the files still; intake queues behind it meanwhile
+    for suffix in ("", "-wal"):
+        if os.path.exists(path + suffix):
+            shutil.copyfile(path + suffix, dest + suffix)
+
+async def measure(batcher, rate, first, until):
+    # Submits at `rate` per second until until() is true; returns latencies in ms
+    latencies, tasks, i = [], [], first
+
+    async def one(i):
+        started = time.perf_counter()
+        await batcher.submit(({**LEAD, "phone": f"903{i:07d}"}, "2026-01-01 09:00:00", None))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    while not until():
+        tasks.append(asyncio.create_task(one(i)))
+        i += 1
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return latencies, i
+
+def report(label, latencies, seconds):
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+    print(f"  {label:<24}{seconds:>8.1f}{len(latencies):>8}{statistics.median(latencies):>9.1f}{p(0.99):>9.1f}{latencies[-1]:>9.1f}")
+
+async def run(app_main, db, tenant, directory, rate, baseline):
+    from backup import take_snapshot
+    from ingest import LeadBatcher
+    batcher = LeadBatcher(db, app_main.insert_leads)
+    print(f"  {'phase':<24}{'seconds':>8}{'leads':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+
+    deadline = time.monotonic() + baseline
+    started = time.monotonic()
+    latencies, next_id = await measure(batcher, rate, 0, lambda: time.monotonic() > deadline)
+    report("no backup", latencies, time.monotonic() - started)
+
+    done = threading.Event()
+
+    def snapshot():
+        try:
+            return take_snapshot(tenant.db_path, tenant.archive_path, directory, app_main.BACKUP_PAGES, app_main.BACKUP_PAUSE)
+        finally:
+            done.set()
+
+    started = time.monotonic()
+    job = asyncio.create_task(asyncio.to_thread(snapshot))
+    latencies, next_id = await measure(batcher, rate, next_id, done.is_set)
+    await job
+    report("online snapshot", latencies, time.monotonic() - started)
+
+    done.clear()
+
+    async def locked_copy():
+        try:
+            await db.write(copy_under_lock, tenant.db_path, os.path.join(directory, "copy.db"))
+        finally:
+            done.set()
+
+    started = time.monotonic()
+    job = asyncio.create_task(locked_copy())
+    latencies, next_id = await measure(batcher, rate, next_id, done.is_set)
+    await job
+    report("cp under write lock", latencies, time.monotonic() - started)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size-mb", type=int, default=2048)
+    parser.add_argument("--rate", type=float, default=200, help="lead submissions per second")
+    parser.add_argument("--baseline-seconds", type=float, default=10)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["LEADS_DB"] = os.path.join(tmp, "bench.db")
+    os.environ.pop("TENANTS_FILE", None)
+    import main as app_main
+    from migrations import migrate
+    tenant = app_main.tenants.get()
+    db = tenant.db
+    migrate(db)
+    print(f"Padding the database to {args.size_mb} MB ...")
+    db.write_sync(pad, args.size_mb)
+    print(f"{app_main.db_bytes(tenant.db_path) / 2 ** 20:.0f} MB database, {args.rate:.0f} leads/sec")
+    asyncio.run(run(app_main, db, tenant, os.path.join(tmp, "backups"), args.rate, args.baseline_seconds))
+    db.close()
+    shutil.rmtree(tmp, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
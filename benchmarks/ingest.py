@@ -0,0 +1,59 @@
+# Lead intake throughput with group commit on and off
+#
+#   python benchmarks/ingest.py --leads 2000 --concurrency 50
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEAD = {"name": "Bench Customer", "email": None, "vehicle": "2016 Toyota Camry", "urgency": "Soon",
+        "issues": "Grinding noise when braking", "contact_method": "Call", "contact_time": "Morning",
+        "intent": "Ready to schedule"}
+
+def lead_row(i):
+    # A distinct phone per lead, otherwise duplicate detection merges them all
+    return {**LEAD, "phone": f"903{i:07d}"}, "2026-01-01 09:00:00", None
+
+async def run(batcher, leads, concurrency):
+    remaining = iter(range(leads))
+
+    async def client():
+        for i in remaining:
+            await batcher.submit(lead_row(i))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return leads / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--max-wait-ms", type=float, default=2)
+    parser.add_argument("--synchronous", default="FULL")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp()
+    os.environ["LEADS_DB"] = os.path.join(tmp, "bench.db")
+    os.environ["LEADS_SYNCHRONOUS"] = args.synchronous
+    import main as app_main
+    from ingest import LeadBatcher
+    from migrations import migrate
+    db = app_main.tenants.get().db
+    migrate(db)
+
+    print(f"{args.leads} leads, {args.concurrency} concurrent clients, synchronous={args.synchronous}")
+    for label, max_batch in (("batching off", 1), ("batching on", args.max_batch)):
+        batcher = LeadBatcher(db, app_main.insert_leads, max_batch, args.max_wait_ms)
+        rate = asyncio.run(run(batcher, args.leads, args.concurrency))
+        print(f"  {label:<13} {rate:10.0f} inserts/sec")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# Load test and traffic replay for the ASGI app
+#
+#   python benchmarks/load.py run --duration 10 --concurrency 20
+#   python benchmarks/load.py run --transport socket --mix post=1,poll=8,pages=2
+#   python benchmarks/load.py replay --file requests.jsonl --speed 4
+#
+# Capture live traffic for replay by starting the app with CAPTURE_FILE=requests.jsonl.
+# Unless --db is given, runs against a fresh temporary database. Needs httpx.
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+LEAD = {
+    "name": "Load Test", "vehicle": "2016 Toyota Camry", "urgency": "Soon", "issues": "Grinding noise when braking",
+    "contact_method": "Text", "contact_time": "Morning", "intent": "Ready to schedule",
+}
+
+# Numbers synthetic leads across every client
+SEQUENCE = itertools.count()
+
+def lead_body(i):
+    # A distinct phone and email per lead, otherwise duplicate detection merges every
+    # POST after the first into one row and "post" measures the merge, not intake
+    return {**LEAD, "phone": f"903{i:07d}", "email": f"load{i}@example.com"}
+
+PAGES = ("/", "/request-service", "/owner")
+
+class Recorder:
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+
+    def add(self, op, seconds, ok):
+        self.latencies.setdefault(op, []).append(seconds)
+        if not ok:
+            self.errors[op] = self.errors.get(op, 0) + 1
+
+    def report(self, elapsed):
+        print(f"{'operation':<16}{'count':>8}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+        everything = []
+        for op in sorted(self.latencies):
+            values = self.latencies[op]
+            everything += values
+            self.row(op, values, self.errors.get(op, 0), elapsed)
+        self.row("total", everything, sum(self.errors.values()), elapsed)
+
+    @staticmethod
+    def row(op, values, errors, elapsed):
+        values = sorted(values)
+
+        def pct(p):
+            return values[min(len(values) - 1, int(p * len(values)))] * 1000
+
+        print(f"{op:<16}{len(values):>8}{errors:>8}{len(values) / elapsed:>10.1f}{pct(0.50):>10.2f}{pct(0.95):>10.2f}{pct(0.99):>10.2f}")
+
+def parse_mix(text):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+async def timed(recorder, op, request):
+    start = time.perf_counter()
+    try:
+        response = await request
+        ok = response.status_code < 400
+    except httpx.HTTPError:
+        ok = False
+    recorder.add(op, time.perf_counter() - start, ok)
+
+async def mixed_client(client, recorder, ops, weights, deadline):
+    etag = None
+    while time.perf_counter() < deadline:
+        op = random.choices(ops, weights)[0]
+        if op == "post":
+            await timed(recorder, op, client.post("/api/leads", json=lead_body(next(SEQUENCE))))
+        elif op == "poll":
+            # Behaves like a dashboard poller: revalidates with the last ETag it saw
+            headers = {"If-None-Match": etag} if etag else {}
+            start = time.perf_counter()
+            try:
+                response = await client.get("/api/leads", params={"limit": 50}, headers=headers)
+                etag = response.headers.get("etag", etag)
+                ok = response.status_code in (200, 304)
+            except httpx.HTTPError:
+                ok = False
+            recorder.add(op, time.perf_counter() - start, ok)
+        else:
+            path = random.choice(PAGES)
+            await timed(recorder, op, client.get(path, headers={"Accept-Encoding": "gzip, br"}))
+
+async def run_mixed(client, args):
+    weights = parse_mix(args.mix)
+    ops = list(weights)
+    recorder = Recorder()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    await asyncio.gather(*(mixed_client(client, recorder, ops, list(weights.values()), deadline) for _ in range(args.concurrency)))
+    recorder.report(time.perf_counter() - start)
+
+def load_capture(path):
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            # Skip anything in the file that is not a captured request
+            if isinstance(entry, dict) and "method" in entry and "path" in entry:
+                entries.append(entry)
+    entries.sort(key=lambda e: e.get("ts", 0))
+    return entries
+
+async def run_replay(client, args):
+    entries = load_capture(args.file)
+    if not entries:
+        sys.exit(f"no captured requests in {args.file}")
+    recorder = Recorder()
+    sem = asyncio.Semaphore(args.concurrency)
+    first = entries[0].get("ts", 0)
+    start = time.perf_counter()
+
+    async def send(entry):
+        # Preserve the original spacing between requests, compressed by --speed
+        delay = (entry.get("ts", first) - first) / args.speed - (time.perf_counter() - start)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        url = entry["path"] + ("?" + entry["query"] if entry.get("query") else "")
+        headers = {k: v for k, v in entry.get("headers", {}).items() if k != "host"}
+        async with sem:
+            await timed(recorder, f"{entry['method']} {entry['path']}", client.request(
+                entry["method"], url, headers=headers, content=entry.get("body", "").encode()))
+
+    await asyncio.gather(*(send(e) for e in entries if not e["path"].endswith("/stream")))
+    recorder.report(time.perf_counter() - start)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(app):
+    import uvicorn
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, thread, f"http://127.0.0.1:{port}"
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="mixed synthetic workload")
+    run.add_argument("--duration", type=float, default=10)
+    run.add_argument("--mix", default="post=1,poll=8,pages=2", help="relative weights of post, poll and pages")
+    replay = sub.add_parser("replay", help="re-run captured traffic")
+    replay.add_argument("--file", default="requests.jsonl")
+    replay.add_argument("--speed", type=float, default=1, help="1 = original pace, N = N times faster")
+    for p in (run, replay):
+        p.add_argument("--transport", choices=("inprocess", "socket"), default="inprocess")
+        p.add_argument("--concurrency", type=int, default=20)
+        p.add_argument("--db", help="database file (default: fresh temporary database)")
+        p.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    os.environ["LEADS_DB"] = args.db or os.path.join(tempfile.mkdtemp(), "bench.db")
+    # Every simulated client shares one address; keep the limiter out of the way unless asked
+    os.environ.setdefault("RATE_LIMIT_PER_MINUTE", "0")
+    os.environ.setdefault("RATE_LIMIT_GLOBAL_PER_SECOND", "0")
+    from main import app, tenants
+    from migrations import migrate
+    # The in-process transport does not run the app lifespan
+    for tenant in tenants:
+        migrate(tenant.db)
+
+    workload = run_mixed if args.command == "run" else run_replay
+    limits = httpx.Limits(max_connections=args.concurrency)
+
+    if args.transport == "inprocess":
+        async def go():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", limits=limits) as client:
+                await workload(client, args)
+        asyncio.run(go())
+    else:
+        server, thread, url = start_server(app)
+        async def go():
+            async with httpx.AsyncClient(base_url=url, limits=limits) as client:
+                await workload(client, args)
+        try:
+            asyncio.run(go())
+        finally:
+            server.should_exit = True
+            thread.join()
+
+if __name__ == "__main__":
+    main()
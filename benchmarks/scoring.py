@@ -0,0 +1,125 @@
+# Lead scoring: cost at intake, and a full re-score after a weights change under live intake
+#
+#   python benchmarks/scoring.py --leads 1000000 --rate 200
+#
+# Loads --leads historical leads, then changes the weights the way a restart with a new
+# SCORING_WEIGHTS_FILE does and lets the background backfill re-score them all, while
+# leads keep arriving at --rate per second. Reports intake latency before and during,
+# and how much the re-score added to it.
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ISSUES = ("Transmission slipping on the highway", "Burning smell after driving", "Grinding noise when braking",
+          "Check engine light is on", "Oil change and inspection", "Leaking fluid under the car", "Won't shift into 3rd")
+
+def lead(i, rng):
+    return {"name": "Bench Customer", "phone": f"903{i:07d}", "email": None, "vehicle": "2016 Toyota Camry",
+            "urgency": rng.choice(("Emergency", "Soon", "Routine")), "issues": rng.choice(ISSUES),
+            "contact_method": "Call", "contact_time": rng.choice(("Morning", "Afternoon", "Evening", None)),
+            "intent": rng.choice(("Ready to schedule", "Not sure yet", "Just looking for an estimate", None))}
+
+def load(conn, leads, scorer):
+    from leads import lead_values
+    from transfer import IMPORT_LEAD
+    rng = random.Random(1)
+    for start in range(0, leads, 50000):
+        rows = []
+        for i in range(start, min(leads, start + 50000)):
+            l = lead(i, rng)
+            l["priority_score"] = scorer.score(l)
+            rows.append(("closed", *lead_values(l, "2025-01-01 09:00:00")))
+        conn.executemany(IMPORT_LEAD, rows)
+        conn.execute("COMMIT")
+        conn.execute("BEGIN IMMEDIATE")
+
+async def measure(batcher, scorer, rate, first, until):
+    latencies, tasks, i = [], [], first
+    rng = random.Random(2)
+
+    async def one(i):
+        started = time.perf_counter()
+        l = lead(i, rng)
+        # As create_lead does
+        l["priority_score"] = scorer.score(l)
+        await batcher.submit((l, "2026-01-01 09:00:00", None))
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    while not until():
+        tasks.append(asyncio.create_task(one(i)))
+        i += 1
+        await asyncio.sleep(1 / rate)
+    await asyncio.gather(*tasks)
+    return latencies, i
+
+def report(label, latencies, seconds):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+    print(f"  {label:<22}{seconds:>8.1f}{len(latencies):>8}{statistics.median(latencies):>9.1f}{p99:>9.1f}{latencies[-1]:>9.1f}")
+    return statistics.median(latencies), p99
+
+async def run(app_main, db, scorer, leads, rate, baseline):
+    from ingest import LeadBatcher
+    from migrations import run_backfills
+    from scoring import sync_weights
+    batcher = LeadBatcher(db, app_main.insert_leads)
+    print(f"  {'phase':<22}{'seconds':>8}{'leads':>8}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    deadline = time.monotonic() + baseline
+    started = time.monotonic()
+    latencies, next_id = await measure(batcher, scorer, rate, leads, lambda: time.monotonic() > deadline)
+    before = report("no re-score", latencies, time.monotonic() - started)
+
+    await db.write(sync_weights, scorer)
+    started = time.monotonic()
+    job = asyncio.create_task(run_backfills(db))
+    latencies, next_id = await measure(batcher, scorer, rate, next_id, job.done)
+    await job
+    during = report("re-scoring", latencies, time.monotonic() - started)
+    # The re-score must not block intake: this should stay within noise of zero
+    print(f"  intake slowdown while re-scoring: p50 {during[0] - before[0]:+.1f} ms, p99 {during[1] - before[1]:+.1f} ms")
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, default=1000000)
+    parser.add_argument("--rate", type=float, default=200, help="lead submissions per second")
+    parser.add_argument("--baseline-seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    os.environ["LEADS_DB"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.pop("TENANTS_FILE", None)
+    os.environ.pop("SCORING_WEIGHTS_FILE", None)
+    import main as app_main
+    from migrations import migrate
+    from scoring import DEFAULT_WEIGHTS, Scorer, sync_weights
+    db = app_main.tenants.get().db
+    migrate(db)
+    db.write_sync(sync_weights, app_main.SCORER)
+
+    sample = [lead(i, random.Random(i)) for i in range(10000)]
+    started = time.perf_counter()
+    for l in sample:
+        app_main.SCORER.score(l)
+    print(f"score() at intake: {(time.perf_counter() - started) / len(sample) * 1e6:.1f} us per lead")
+
+    print(f"Loading {args.leads} leads ...")
+    db.write_sync(load, args.leads, app_main.SCORER)
+    # What a restart with a new weights file does: the weights differ from the stored ones
+    reweighted = Scorer({**DEFAULT_WEIGHTS, "urgency": {"Emergency": 120, "Soon": 60, "Routine": 0}})
+    app_main.SCORER = reweighted
+    print(f"Re-scoring {args.leads} leads at {args.rate:.0f} new leads/sec")
+    asyncio.run(run(app_main, db, reweighted, args.leads, args.rate, args.baseline_seconds))
+    stale = db.read_sync(lambda conn: conn.execute(
+        f"SELECT count(*) FROM leads WHERE priority_score IS NOT ({reweighted.sql()})").fetchone()[0])
+    print(f"  leads with a stale score afterwards: {stale}")
+    db.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# CPU per response and payload size for GET /api/leads encodings
+#
+#   python benchmarks/serialize.py --leads 5000 --iterations 300
+#
+# "dict + JSONResponse" is the previous response path. Each figure includes running the
+# query itself, shown on its own as "query only".
+
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LEAD = {"name": "Bench Customer", "email": "bench@example.com", "vehicle": "2016 Toyota Camry", "urgency": "Soon",
+        "issues": "Grinding noise when braking, worse in the morning", "contact_method": "Call",
+        "contact_time": "Morning", "intent": "Ready to schedule"}
+
+def cpu_per_call(fn, iterations):
+    fn()
+    start = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - start) / iterations
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--leads", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=300)
+    parser.add_argument("--limits", default="50,200,500")
+    args = parser.parse_args()
+
+    os.environ["LEADS_DB"] = os.path.join(tempfile.mkdtemp(), "bench.db")
+    os.environ.pop("TENANTS_FILE", None)
+    import main as app_main
+    from db import connect
+    from fastapi.responses import JSONResponse
+    from migrations import migrate
+    from serialize import ENCODERS, encode_rows, orjson, stdlib_json
+
+    tenant = app_main.tenants.get()
+    migrate(tenant.db)
+    # Distinct phone and email per lead, otherwise duplicate detection merges them all
+    tenant.db.write_sync(app_main.insert_leads, [
+        ({**LEAD, "phone": f"903{i:07d}", "email": f"bench{i}@example.com"}, "2026-01-01 09:00:00", None)
+        for i in range(args.leads)
+    ])
+    tenant.db.close()
+    conn = connect(tenant.db_path, readonly=True)
+
+    def variants(limit):
+        select = lambda: app_main.select_leads(conn, limit)
+        yield "query only", select
+        yield "dict + JSONResponse", lambda: JSONResponse(app_main.fetch_leads(conn, limit)).body
+        yield "records, stdlib", lambda: encode_rows(*select(), "records", stdlib_json)
+        if orjson is not None:
+            yield "records, orjson", lambda: encode_rows(*select(), "records", orjson.dumps)
+        yield "columns, stdlib", lambda: encode_rows(*select(), "columns", stdlib_json)
+        if orjson is not None:
+            yield "columns, orjson", lambda: encode_rows(*select(), "columns", orjson.dumps)
+        if "msgpack" in ENCODERS:
+            yield "records, msgpack", lambda: encode_rows(*select(), "records", ENCODERS["msgpack"])
+            yield "columns, msgpack", lambda: encode_rows(*select(), "columns", ENCODERS["msgpack"])
+
+    print(f"{args.leads} leads, {args.iterations} iterations" + ("" if "msgpack" in ENCODERS else " (msgpack not installed)"))
+    for limit in map(int, args.limits.split(",")):
+        print(f"\nlimit={limit}")
+        print(f"  {'encoding':<22}{'cpu us':>10}{'bytes':>10}{'gzip':>10}")
+        for label, fn in variants(limit):
+            seconds = cpu_per_call(fn, args.iterations)
+            body = fn()
+            if isinstance(body, bytes):
+                print(f"  {label:<22}{seconds * 1e6:>10.0f}{len(body):>10}{len(gzip.compress(body)):>10}")
+            else:
+                print(f"  {label:<22}{seconds * 1e6:>10.0f}")
+    conn.close()
+
+if __name__ == "__main__":
+    main()
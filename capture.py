@@ -0,0 +1,45 @@
+# Traffic capture: append every HTTP request to a JSON-lines file for later replay
+# (see benchmarks/load.py replay). Bodies are recorded verbatim, including customer
+# contact details, so only enable this where that is acceptable.
+
+import json
+import time
+
+# Headers that change how the app answers; everything else is left out of the log
+KEPT_HEADERS = {"accept", "accept-encoding", "content-type", "if-none-match", "last-event-id", "host"}
+
+class TrafficCapture:
+    def __init__(self, app, path):
+        self.app = app
+        self.file = open(path, "a", buffering=1, encoding="utf-8")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        ts = time.time()
+        chunks = []
+
+        async def recording_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body"):
+                    self.record(scope, ts, b"".join(chunks))
+            return message
+
+        if scope["method"] in ("GET", "HEAD"):
+            self.record(scope, ts, b"")
+            return await self.app(scope, receive, send)
+        return await self.app(scope, recording_receive, send)
+
+    def record(self, scope, ts, body):
+        headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in scope["headers"] if k.decode("latin-1") in KEPT_HEADERS}
+        self.file.write(json.dumps({
+            "ts": round(ts, 6),
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope["query_string"].decode("latin-1"),
+            "headers": headers,
+            "body": body.decode("utf-8", "replace"),
+        }) + "\n")
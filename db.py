@@ -0,0 +1,96 @@
+# SQLite data access: a small pool of reader connections and one writer thread
+
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -16000",
+    "PRAGMA mmap_size = 134217728",
+)
+
+def connect(path, readonly=False, synchronous="NORMAL", attach=None):
+    # isolation_level=None: transactions are opened explicitly by Database._run
+    conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, cached_statements=256)
+    conn.row_factory = sqlite3.Row
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    # WAL + NORMAL survives app crashes but not power loss; FULL fsyncs every commit
+    conn.execute(f"PRAGMA synchronous = {synchronous}")
+    # attach: {schema name: path}; journal mode and synchronous are per database file
+    for name, attached in (attach or {}).items():
+        conn.execute(f"ATTACH DATABASE ? AS {name}", (attached,))
+        conn.execute(f"PRAGMA {name}.journal_mode = WAL")
+        conn.execute(f"PRAGMA {name}.synchronous = {synchronous}")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+    return conn
+
+class Database:
+    def __init__(self, path, readers=4, synchronous="FULL", observe=None, attach=None):
+        self.path = path
+        self.synchronous = synchronous
+        self.attach = attach
+        # observe(op, phase, seconds) receives connect/execute/commit timings per call
+        self.observe = observe
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.readers = ThreadPoolExecutor(readers, thread_name_prefix="db-read")
+        self.writer = ThreadPoolExecutor(1, thread_name_prefix="db-write")
+
+    def _conn(self, readonly):
+        # One connection per pool thread, opened on first use
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = connect(self.path, readonly, self.synchronous, self.attach)
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def _run(self, write, fn, args, queued):
+        # "connect" covers waiting for a pooled connection plus opening it on first use
+        conn = self._conn(readonly=not write)
+        started = time.perf_counter()
+        # Reads get one consistent snapshot; writes take the write lock up front
+        conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.rollback()
+            raise
+        executed = time.perf_counter()
+        conn.commit()
+        if self.observe is not None:
+            op = fn.__name__
+            self.observe(op, "connect", started - queued)
+            self.observe(op, "execute", executed - started)
+            self.observe(op, "commit", time.perf_counter() - executed)
+        return result
+
+    async def read(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.readers, self._run, False, fn, args, time.perf_counter())
+
+    async def write(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.writer, self._run, True, fn, args, time.perf_counter())
+
+    def read_sync(self, fn, *args):
+        return self.readers.submit(self._run, False, fn, args, time.perf_counter()).result()
+
+    def write_sync(self, fn, *args):
+        return self.writer.submit(self._run, True, fn, args, time.perf_counter()).result()
+
+    def close(self):
+        self.readers.shutdown()
+        self.writer.shutdown()
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
@@ -0,0 +1,119 @@
+# Duplicate and resubmission detection for lead intake
+#
+# Two checks, both single index probes on the writer thread before the insert:
+#   - Idempotency-Key: a retried POST gets the lead_id its first attempt created
+#   - same customer (normalized phone or email) and same vehicle + issue within the
+#     window: merged into the earlier lead instead of becoming a second row
+# Leads stored before this migration have no keys and never match.
+
+import hashlib
+import re
+from datetime import datetime, timedelta
+from leads import LEAD_COLUMNS, TIME_FORMAT
+from schema import add_column
+
+def normalize_phone(phone):
+    digits = re.sub(r"\D", "", phone)
+    # US numbers with or without the country code are the same number
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits or phone.strip().lower()
+
+def normalize_email(email):
+    return email.strip().lower() if email else None
+
+def content_hash(lead):
+    # Case and whitespace differences do not make a new request
+    text = "\x1f".join(" ".join(lead[k].lower().split()) for k in ("vehicle", "issues"))
+    return hashlib.sha256(text.encode()).hexdigest()[:16]
+
+def dedupe_keys(lead):
+    # Extra INSERT_LEAD parameters: phone_norm, email_norm, content_hash
+    return normalize_phone(lead["phone"]), normalize_email(lead["email"]), content_hash(lead)
+
+def window_start(minutes):
+    return (datetime.now() - timedelta(minutes=minutes)).strftime(TIME_FORMAT)
+
+def create_dedupe(conn):
+    for column in (
+        "phone_norm TEXT",
+        "email_norm TEXT",
+        "content_hash TEXT",
+        "duplicates INTEGER NOT NULL DEFAULT 0",
+        "last_seen_at TEXT",
+    ):
+        add_column(conn, "leads", column)
+    # Partial: leads without keys (imports, older rows) never take space in them
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_dedupe_phone
+        ON leads (phone_norm, content_hash, created_at) WHERE phone_norm IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_dedupe_email
+        ON leads (email_norm, content_hash, created_at) WHERE email_norm IS NOT NULL
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            key TEXT PRIMARY KEY,
+            lead_id INTEGER NOT NULL,
+            created_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+
+def index_key_ages(conn):
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_idempotency_created ON idempotency_keys (created_at)")
+
+def find_retry(conn, key):
+    row = conn.execute("SELECT lead_id FROM idempotency_keys WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def find_duplicate(conn, phone_norm, email_norm, digest, since):
+    # A closed lead is done with: a resubmission after that is a new request, which
+    # must reach the queue and alert like any other
+    row = conn.execute("""
+        SELECT id FROM leads INDEXED BY idx_leads_dedupe_phone
+        WHERE phone_norm = ? AND content_hash = ? AND created_at >= ? AND status != 'closed'
+        ORDER BY created_at DESC
+        LIMIT 1
+    """, (phone_norm, digest, since)).fetchone()
+    if row is None and email_norm:
+        row = conn.execute("""
+            SELECT id FROM leads INDEXED BY idx_leads_dedupe_email
+            WHERE email_norm = ? AND content_hash = ? AND created_at >= ? AND status != 'closed'
+            ORDER BY created_at DESC
+            LIMIT 1
+        """, (email_norm, digest, since)).fetchone()
+    return row[0] if row else None
+
+def merge_duplicate(conn, lead_id, lead, seen_at):
+    # Counts the resubmission and fills in anything the first one left blank; the
+    # version bump makes open dashboards and advisors pick up the change
+    row = conn.execute(f"""
+        UPDATE leads
+        SET duplicates = duplicates + 1, last_seen_at = ?, version = version + 1,
+            email = coalesce(email, ?), email_norm = coalesce(email_norm, ?),
+            contact_method = coalesce(contact_method, ?), contact_time = coalesce(contact_time, ?),
+            intent = coalesce(intent, ?)
+        WHERE id = ?
+        RETURNING {LEAD_COLUMNS}
+    """, (seen_at, lead["email"], normalize_email(lead["email"]), lead["contact_method"], lead["contact_time"],
+          lead["intent"], lead_id)).fetchone()
+    return dict(row)
+
+def remember_key(conn, key, lead_id, created_at):
+    conn.execute("INSERT OR IGNORE INTO idempotency_keys (key, lead_id, created_at) VALUES (?, ?, ?)",
+                 (key, lead_id, created_at))
+
+def keys_expired(conn, before):
+    # Checked on a reader first, so a pass with nothing to expire takes no write lock
+    return conn.execute("""
+        SELECT 1 FROM idempotency_keys INDEXED BY idx_idempotency_created WHERE created_at < ? LIMIT 1
+    """, (before,)).fetchone() is not None
+
+def expire_keys(conn, before, size=5000):
+    # Drops keys created before `before`, one bounded chunk per call so a large first
+    # pass never holds the writer for long; returns how many went
+    return conn.execute("""
+        DELETE FROM idempotency_keys
+        WHERE key IN (SELECT key FROM idempotency_keys INDEXED BY idx_idempotency_created WHERE created_at < ? LIMIT ?)
+    """, (before, size)).rowcount
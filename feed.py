@@ -0,0 +1,42 @@
+# In-process fan-out of lead changes to live dashboard streams (Server-Sent Events).
+# Streams treat an event as a signal to read the database now (main.read_changes); the
+# rows they send always come from there.
+
+import asyncio
+import json
+
+class Subscription:
+    def __init__(self, size):
+        self.queue = asyncio.Queue(size)
+        self.overflowed = False
+
+class LeadFeed:
+    def __init__(self, queue_size=256):
+        self.queue_size = queue_size
+        self.subscribers = set()
+
+    def subscribe(self):
+        sub = Subscription(self.queue_size)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+    def publish(self, event, lead):
+        for sub in list(self.subscribers):
+            try:
+                sub.queue.put_nowait((event, lead))
+            except asyncio.QueueFull:
+                # Slow client: stop feeding it. Its stream subscribes again; nothing
+                # is lost, as the rows come from the database.
+                sub.overflowed = True
+                self.subscribers.discard(sub)
+
+def sse(data, event=None, id=None):
+    msg = ""
+    if event:
+        msg += f"event: {event}\n"
+    if id is not None:
+        msg += f"id: {id}\n"
+    return msg + f"data: {json.dumps(data)}\n\n"
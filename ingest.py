@@ -0,0 +1,56 @@
+# Group commit for lead intake: concurrent submissions share one write transaction
+
+import asyncio
+
+class LeadBatcher:
+    def __init__(self, db, insert_many, max_batch=64, max_wait_ms=2):
+        # insert_many(conn, rows) runs on the writer thread and returns one id per row
+        self.db = db
+        self.insert_many = insert_many
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = None
+        self.worker = None
+
+    async def submit(self, row):
+        if self.max_batch <= 1:
+            return (await self.db.write(self.insert_many, [row]))[0]
+        if self.worker is None or self.worker.done():
+            self.queue = self.queue or asyncio.Queue()
+            self.worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        self.queue.put_nowait((row, future))
+        # Resolved only after the batch containing this row has committed
+        return await future
+
+    async def _collect(self):
+        batch = [await self.queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            # Whatever queued up while the previous batch was committing joins for free
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            try:
+                ids = await self.db.write(self.insert_many, [row for row, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            else:
+                for (_, future), lead_id in zip(batch, ids):
+                    if not future.done():
+                        future.set_result(lead_id)
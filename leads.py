@@ -0,0 +1,35 @@
+# Lead fields and the validation rules shared by the intake form and bulk import
+
+from datetime import datetime
+
+LEAD_COLUMNS = ("id, created_at, name, phone, email, vehicle, urgency, issues, status, contact_method, contact_time, intent, "
+                "version, claimed_by, claimed_at, duplicates, created_ts, priority_score")
+
+REQUIRED = ("name", "phone", "vehicle", "urgency", "issues")
+OPTIONAL = ("email", "contact_method", "contact_time", "intent")
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def now():
+    return datetime.now().strftime(TIME_FORMAT)
+
+def epoch(created_at):
+    # created_ts for a created_at string: Unix seconds, read as local time like now()
+    return int(datetime.strptime(created_at, TIME_FORMAT).timestamp())
+
+def clean_lead(data):
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    lead = {k: str(data.get(k) or "").strip() for k in REQUIRED}
+    # Basic validation
+    if not all(lead.values()):
+        raise ValueError("Missing required fields")
+    for k in OPTIONAL:
+        lead[k] = str(data.get(k) or "").strip() or None
+    return lead
+
+def lead_values(lead, created_at):
+    # Parameter order of INSERT_LEAD (followed there by dedupe.dedupe_keys); priority_score
+    # is set by the caller's scoring.Scorer
+    return (created_at, epoch(created_at), lead["name"], lead["phone"], lead["email"], lead["vehicle"], lead["urgency"],
+            lead["issues"], lead["contact_method"], lead["contact_time"], lead["intent"], lead.get("priority_score"))
@@ -0,0 +1,151 @@
+# Rate limiting and early rejection for public write endpoints (pure ASGI)
+#
+# Runs before routing and before the handler touches the body: per-client and
+# per-location token buckets first (no I/O), then a size cap and a JSON parse on the
+# buffered body. Intake (`paths`) gets the buckets; every other POST still gets the size
+# cap and JSON check. Bulk uploads (`uploads`) are streamed, not buffered or parsed: they
+# have their own, much slower, per-client bucket and must declare a Content-Length
+# within max_upload. Rejections are counted in http_rejections_total by reason.
+
+import json
+import math
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+loads = orjson.loads if orjson is not None else json.loads
+
+def take(bucket, rate, burst, now):
+    # bucket is [tokens, last refill]; returns 0 when a token was taken,
+    # otherwise the seconds until one will be available
+    tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+    bucket[1] = now
+    if tokens >= 1:
+        bucket[0] = tokens - 1
+        return 0
+    bucket[0] = tokens
+    return (1 - tokens) / rate
+
+class RateLimiter:
+    def __init__(self, app, metrics, paths=("/api/leads",), ip_rate=20 / 60, ip_burst=10,
+                 global_rate=100, global_burst=200, max_clients=10000, max_body=16384,
+                 uploads=("/api/leads/import",), upload_rate=12 / 3600, upload_burst=3, max_upload=64 * 2 ** 20,
+                 message="Too many requests, please try again shortly"):
+        # Rates are tokens per second; a rate of 0 turns that bucket off
+        self.app = app
+        self.metrics = metrics
+        self.paths = frozenset(paths)
+        self.ip_rate, self.ip_burst = ip_rate, ip_burst
+        self.global_rate, self.global_burst = global_rate, global_burst
+        self.max_clients = max_clients
+        self.max_body = max_body
+        self.uploads = frozenset(uploads)
+        self.upload_rate, self.upload_burst = upload_rate, upload_burst
+        self.max_upload = max_upload
+        self.message = message
+        # Least recently seen client first; memory stays bounded, at the price of an
+        # evicted client coming back with a full bucket
+        self.clients = OrderedDict()
+        self.uploaders = OrderedDict()
+        # One global bucket per location, since each has its own writer
+        self.globals = {}
+        metrics.describe("http_rejections_total", "counter", "Requests rejected before reaching a handler, by reason.")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+        # Path as routed, i.e. without a tenant prefix
+        path, root = scope["path"], scope.get("root_path", "")
+        if root and path.startswith(root):
+            path = path[len(root):]
+        length = None
+        for k, v in scope["headers"]:
+            if k == b"content-length":
+                length = int(v) if v.isdigit() else -1
+                break
+
+        now = time.monotonic()
+        if path in self.uploads:
+            if self.upload_rate > 0:
+                wait = self.client_wait(self.uploaders, scope, self.upload_rate, self.upload_burst, now)
+                if wait:
+                    return await self.reject(send, 429, "upload_rate", self.message, wait)
+            # The upload is streamed to the handler, so its size is known up front or not at all
+            if length is None or length < 0:
+                return await self.reject(send, 411, "length_required", "Content-Length is required for uploads")
+            if length > self.max_upload:
+                return await self.reject(send, 413, "too_large", "Upload is too large")
+            return await self.app(scope, receive, send)
+
+        if path in self.paths:
+            if self.ip_rate > 0:
+                wait = self.client_wait(self.clients, scope, self.ip_rate, self.ip_burst, now)
+                if wait:
+                    return await self.reject(send, 429, "client_rate", self.message, wait)
+            if self.global_rate > 0:
+                tenant = getattr(scope.get("state", {}).get("tenant"), "slug", "")
+                bucket = self.globals.get(tenant)
+                if bucket is None:
+                    bucket = self.globals[tenant] = [self.global_burst, now]
+                wait = take(bucket, self.global_rate, self.global_burst, now)
+                if wait:
+                    return await self.reject(send, 429, "global_rate", self.message, wait)
+
+        if length is not None and (length < 0 or length > self.max_body):
+            return await self.reject(send, 413, "too_large", "Request body is too large")
+        # Chunked uploads have no Content-Length, so the cap is enforced while reading too
+        chunks, size = [], 0
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunk = message.get("body", b"")
+            size += len(chunk)
+            if size > self.max_body:
+                return await self.reject(send, 413, "too_large", "Request body is too large")
+            chunks.append(chunk)
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        try:
+            loads(body)
+        except ValueError:
+            return await self.reject(send, 400, "bad_json", "Request body is not valid JSON")
+
+        replayed = False
+
+        async def replay():
+            # Hands the buffered body to the handler, then defers to the server
+            nonlocal replayed
+            if replayed:
+                return await receive()
+            replayed = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app(scope, replay, send)
+
+    def client_wait(self, clients, scope, rate, burst, now):
+        client = scope.get("client")
+        # Behind a proxy, run uvicorn with --proxy-headers so this is the real client
+        ip = client[0] if client else ""
+        bucket = clients.get(ip)
+        if bucket is None:
+            bucket = clients[ip] = [burst, now]
+            if len(clients) > self.max_clients:
+                clients.popitem(last=False)
+        else:
+            clients.move_to_end(ip)
+        return take(bucket, rate, burst, now)
+
+    async def reject(self, send, status, reason, message, retry_after=None):
+        self.metrics.inc("http_rejections_total", (("reason", reason),))
+        body = json.dumps({"ok": False, "error": message}).encode()
+        headers = [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        if retry_after:
+            headers.append((b"retry-after", str(math.ceil(retry_after)).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,168 @@
+# Maintenance commands for the leads database
+#
+#   python manage.py migrate
+#   python manage.py rebuild-stats
+#   python manage.py import history.csv
+#   python manage.py archive --days 365 --closed-days 30
+#   python manage.py backup --dir backups
+#   python manage.py verify --dir backups            (newest snapshot of each location)
+#   python manage.py --tenant longview restore backups/longview/20260101T060000Z
+#   python manage.py --tenant longview migrate
+
+import argparse
+import os
+import sys
+
+def selected(args):
+    # --tenant picks one location; migrate and archive default to all of them, other commands to the default
+    from main import tenants
+    if args.tenant:
+        return [tenants.get(args.tenant)]
+    return list(tenants) if args.command in ("migrate", "archive", "backup", "verify") else [tenants.get()]
+
+def open_db(args):
+    from migrations import migrate
+    db = selected(args)[0].db
+    migrate(db)
+    return db
+
+def migrate_command(args):
+    from main import SCORER
+    from migrations import LATEST, migrate, run_backfills_sync
+    from scoring import sync_weights
+    for tenant in selected(args):
+        print(f"{tenant.slug}: migrated to schema version", LATEST if migrate(tenant.db) else f"{LATEST} (already current)")
+        if tenant.db.write_sync(sync_weights, SCORER):
+            print(f"{tenant.slug}: scoring weights changed, re-scoring stored leads")
+        run_backfills_sync(tenant.db)
+    print("Backfills complete")
+
+def rebuild_stats_command(args):
+    from stats import rebuild_stats
+    db = open_db(args)
+    total = db.write_sync(rebuild_stats)
+    print(f"Rebuilt dashboard stats from {total} leads")
+
+def import_command(args):
+    from main import SCORER
+    from transfer import import_leads
+    db = open_db(args)
+    fmt = args.format or ("csv" if args.file.endswith(".csv") else "ndjson")
+    with open(args.file, encoding="utf-8-sig", errors="replace", newline="") as f:
+        result = import_leads(db, f, fmt, score=SCORER.score)
+    print(f"Imported {result['imported']} leads, rejected {result['rejected']}")
+    for error in result["errors"]:
+        print(f"  record {error['record']}: {error['error']}")
+    if "stopped" in result:
+        sys.exit(f"Import stopped: {result['stopped']}")
+
+def archive_command(args):
+    from archive import run_archival_sync
+    from main import ARCHIVE_AFTER_DAYS, ARCHIVE_CLOSED_AFTER_DAYS
+    from migrations import migrate, run_backfills_sync
+    days = ARCHIVE_AFTER_DAYS if args.days is None else args.days
+    closed_days = ARCHIVE_CLOSED_AFTER_DAYS if args.closed_days is None else args.closed_days
+    for tenant in selected(args):
+        migrate(tenant.db)
+        # Archival waits for pending backfills, so finish those first
+        run_backfills_sync(tenant.db)
+        moved = run_archival_sync(tenant.db, days, closed_days)
+        print(f"{tenant.slug}: moved {moved} leads to {tenant.archive_path}")
+
+def backup_dir(args, tenant):
+    from main import BACKUP_DIR
+    root = args.dir or BACKUP_DIR
+    if not root:
+        sys.exit("No backup directory: pass --dir or set BACKUP_DIR")
+    return os.path.join(root, tenant.slug)
+
+def backup_command(args):
+    from backup import prune, take_snapshot
+    from main import BACKUP_KEEP, BACKUP_PAGES, BACKUP_PAUSE
+    for tenant in selected(args):
+        directory = backup_dir(args, tenant)
+        path = take_snapshot(tenant.db_path, tenant.archive_path, directory, BACKUP_PAGES, BACKUP_PAUSE)
+        removed = prune(directory, *BACKUP_KEEP)
+        print(f"{tenant.slug}: wrote {path}" + (f", pruned {len(removed)} old snapshots" if removed else ""))
+
+def verify_command(args):
+    from backup import describe_database, snapshots, verify_database
+    failed = False
+    if args.snapshot:
+        targets = [("snapshot", args.snapshot)]
+    else:
+        targets = []
+        for tenant in selected(args):
+            directory = backup_dir(args, tenant)
+            names = snapshots(directory)
+            if not names:
+                print(f"{tenant.slug}: no snapshots in {directory}")
+                failed = True
+                continue
+            targets.append((tenant.slug, os.path.join(directory, names[0])))
+    for label, snapshot in targets:
+        for name in ("leads.db", "archive.db"):
+            path = os.path.join(snapshot, name)
+            if not os.path.exists(path):
+                if name == "leads.db":
+                    print(f"{label}: {path} is missing")
+                    failed = True
+                continue
+            problems = verify_database(path)
+            if problems:
+                failed = True
+                print(f"{label}: {path} is damaged")
+                for problem in problems[:20]:
+                    print(f"  {problem}")
+            else:
+                version, leads = describe_database(path)
+                print(f"{label}: {path} ok, schema version {version}, {leads} leads")
+    if failed:
+        sys.exit(1)
+
+def restore_command(args):
+    from backup import BackupError, restore_snapshot, take_snapshot
+    from main import BACKUP_DIR
+    tenant = selected(args)[0]
+    # Whatever is there now is kept as a snapshot of its own, in case this was the wrong one
+    if os.path.exists(tenant.db_path) and (args.dir or BACKUP_DIR):
+        print(f"{tenant.slug}: saved current database as {take_snapshot(tenant.db_path, tenant.archive_path, backup_dir(args, tenant))}")
+    try:
+        restore_snapshot(args.snapshot, tenant.db_path, tenant.archive_path)
+    except BackupError as e:
+        sys.exit(f"Not restored: {e}")
+    print(f"{tenant.slug}: restored {args.snapshot}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Leads database maintenance")
+    parser.add_argument("--tenant", help="location slug from TENANTS_FILE")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="apply schema migrations and finish pending backfills").set_defaults(func=migrate_command)
+    sub.add_parser("rebuild-stats", help="recompute dashboard aggregates from the leads, archived ones included").set_defaults(func=rebuild_stats_command)
+    imp = sub.add_parser("import", help="bulk load leads from an NDJSON or CSV file")
+    imp.add_argument("file")
+    imp.add_argument("--format", choices=("ndjson", "csv"))
+    imp.set_defaults(func=import_command)
+    arc = sub.add_parser("archive", help="move old and closed leads to the archive database now")
+    arc.add_argument("--days", type=float, help="archive leads older than this (default: ARCHIVE_AFTER_DAYS)")
+    arc.add_argument("--closed-days", type=float, help="archive closed leads older than this (default: ARCHIVE_CLOSED_AFTER_DAYS)")
+    arc.set_defaults(func=archive_command)
+    bak = sub.add_parser("backup", help="write a snapshot of each location now and prune old ones")
+    bak.add_argument("--dir", help="snapshot root (default: BACKUP_DIR)")
+    bak.set_defaults(func=backup_command)
+    ver = sub.add_parser("verify", help="run an integrity check on a snapshot (default: the newest of each location)")
+    ver.add_argument("snapshot", nargs="?")
+    ver.add_argument("--dir", help="snapshot root (default: BACKUP_DIR)")
+    ver.set_defaults(func=verify_command)
+    res = sub.add_parser("restore", help="check a snapshot, then copy it over the location's databases (stop the app first)")
+    res.add_argument("snapshot")
+    res.add_argument("--dir", help="where to save the current databases first (default: BACKUP_DIR)")
+    res.set_defaults(func=restore_command)
+    args = parser.parse_args()
+    try:
+        args.func(args)
+    except KeyError:
+        parser.error(f"unknown tenant {args.tenant}" if args.tenant else "no default tenant; pass --tenant")
+
+if __name__ == "__main__":
+    main()
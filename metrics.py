@@ -0,0 +1,133 @@
+# In-process metrics in Prometheus text format.
+# Each thread updates its own shard (no locks on the hot path); /metrics sums the shards.
+
+import bisect
+import logging
+import threading
+import time
+
+log = logging.getLogger("leads.metrics")
+
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+class Metrics:
+    def __init__(self):
+        self.local = threading.local()
+        self.shards = []
+        self.lock = threading.Lock()
+        self.types = {}
+
+    def describe(self, name, kind, help_text):
+        self.types[name] = (kind, help_text)
+
+    def _shard(self):
+        shard = getattr(self.local, "shard", None)
+        if shard is None:
+            shard = self.local.shard = {}
+            # Only taken once per thread, when its shard is registered
+            with self.lock:
+                self.shards.append(shard)
+        return shard
+
+    def inc(self, name, labels=(), value=1):
+        shard = self._shard()
+        key = (name, labels)
+        shard[key] = shard.get(key, 0) + value
+
+    def observe(self, name, labels, seconds):
+        shard = self._shard()
+        key = (name, labels)
+        hist = shard.get(key)
+        if hist is None:
+            # Per-bucket counts, then +Inf, count and sum
+            hist = shard[key] = [0] * (len(BUCKETS) + 3)
+            hist[-1] = 0.0
+        hist[bisect.bisect_left(BUCKETS, seconds)] += 1
+        hist[-2] += 1
+        hist[-1] += seconds
+
+    def snapshot(self):
+        with self.lock:
+            shards = list(self.shards)
+        merged = {}
+        for shard in shards:
+            for key, value in shard.copy().items():
+                if isinstance(value, list):
+                    total = merged.setdefault(key, [0] * len(value))
+                    for i, v in enumerate(value):
+                        total[i] += v
+                else:
+                    merged[key] = merged.get(key, 0) + value
+        return merged
+
+    def render(self, gauges=()):
+        # gauges: extra (name, labels, value) read at scrape time
+        families = {}
+        for (name, labels), value in self.snapshot().items():
+            families.setdefault(name, []).append((labels, value))
+        for name, labels, value in gauges:
+            families.setdefault(name, []).append((labels, value))
+
+        lines = []
+        for name in sorted(families):
+            kind, help_text = self.types.get(name, ("untyped", ""))
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in sorted(families[name], key=lambda item: item[0]):
+                if isinstance(value, list):
+                    cumulative = 0
+                    for bound, count in zip(BUCKETS + ("+Inf",), value):
+                        cumulative += count
+                        lines.append(f"{name}_bucket{fmt_labels(labels + (('le', str(bound)),))} {cumulative}")
+                    lines.append(f"{name}_count{fmt_labels(labels)} {value[-2]}")
+                    lines.append(f"{name}_sum{fmt_labels(labels)} {value[-1]:.6f}")
+                else:
+                    lines.append(f"{name}{fmt_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+def fmt_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}"
+
+class MetricsMiddleware:
+    def __init__(self, app, metrics, slow_ms=None):
+        self.app = app
+        self.metrics = metrics
+        # Opt-in slow request log; None disables it
+        self.slow = slow_ms / 1000 if slow_ms else None
+        metrics.describe("http_requests_total", "counter", "HTTP requests by route and status.")
+        metrics.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route (streaming responses excluded).")
+        metrics.describe("http_requests_in_flight", "gauge", "HTTP requests currently being served.")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        metrics = self.metrics
+        start = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def timed_send(message):
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                for k, v in message.get("headers", ()):
+                    if k == b"content-type" and v.startswith(b"text/event-stream"):
+                        streaming = True
+            await send(message)
+
+        metrics.inc("http_requests_in_flight")
+        try:
+            await self.app(scope, receive, timed_send)
+        finally:
+            metrics.inc("http_requests_in_flight", value=-1)
+            elapsed = time.perf_counter() - start
+            # Route template, not the raw path, keeps label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            metrics.inc("http_requests_total", (("method", scope["method"]), ("route", route), ("status", str(status))))
+            if not streaming:
+                metrics.observe("http_request_duration_seconds", (("route", route),), elapsed)
+                if self.slow is not None and elapsed >= self.slow:
+                    log.warning("slow request: %s %s -> %s in %.1f ms", scope["method"], scope["path"], status, elapsed * 1000)
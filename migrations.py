@@ -0,0 +1,162 @@
+# Versioned schema migrations, keyed on PRAGMA user_version
+#
+# Each step runs once per database, in order. Steps must stay safe on databases
+# created before migrations existed (user_version 0 with some tables present),
+# hence IF NOT EXISTS and add_column. Append new steps; never edit shipped ones.
+
+import asyncio
+import sqlite3
+import time
+from archive import create_archive, create_retention, fill_created_ts
+from dedupe import create_dedupe, index_key_ages
+from notify import create_outbox
+from schema import add_column
+from scoring import create_scoring, rescore_range
+from search import create_search_index, index_range
+from stats import count_range, create_stats, track_merged_fields
+from triage import create_triage
+
+def initial_schema(conn):
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            created_at TEXT NOT NULL,
+            name TEXT NOT NULL,
+            phone TEXT NOT NULL,
+            email TEXT,
+            vehicle TEXT NOT NULL,
+            urgency TEXT NOT NULL,
+            issues TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'new'
+        )
+    """)
+    for column in ("contact_method TEXT", "contact_time TEXT", "intent TEXT"):
+        add_column(conn, "leads", column)
+    # Work list for schema.schedule_backfill / run_backfills
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS backfills (
+            name TEXT PRIMARY KEY,
+            cursor INTEGER NOT NULL,
+            until_id INTEGER NOT NULL
+        )
+    """)
+
+def change_counter(conn):
+    # Modification counter bumped on every change; with the AUTOINCREMENT
+    # high-water mark it makes the ETag for GET /api/leads
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS leads_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO leads_version (id, version) VALUES (1, 0)")
+    for event in ("INSERT", "UPDATE", "DELETE"):
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS leads_version_{event.lower()} AFTER {event} ON leads BEGIN
+                UPDATE leads_version SET version = version + 1 WHERE id = 1;
+            END
+        """)
+
+def change_sequence(conn):
+    # leads.updated_seq: the leads_version value of a lead's last change, so live streams
+    # in every worker can poll for changed rows (main.read_changes). Set by trigger on
+    # each version bump to one more than the counter. Its own update bumps leads_version
+    # too, so the counter never trails a stored updated_seq and later changes sort after.
+    add_column(conn, "leads", "updated_seq INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_updated_seq ON leads (updated_seq)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS leads_updated_seq AFTER UPDATE OF version ON leads BEGIN
+            UPDATE leads SET updated_seq = (SELECT version FROM leads_version WHERE id = 1) + 1 WHERE id = new.id;
+        END
+    """)
+    create_archive(conn)
+
+MIGRATIONS = (
+    (1, initial_schema),
+    (2, change_counter),
+    (3, create_search_index),
+    (4, create_stats),
+    (5, create_triage),
+    (6, create_dedupe),
+    (7, create_retention),
+    (8, create_outbox),
+    (9, create_scoring),
+    (10, track_merged_fields),
+    (11, index_key_ages),
+    (12, change_sequence),
+)
+
+LATEST = MIGRATIONS[-1][0]
+
+# Scheduled backfills: (fn(conn, after_id, until_id), rows per chunk, pause in seconds
+# between chunks). The re-score's small chunks hold the writer for a few milliseconds
+# and its pauses are longer than that, so intake latency stays at its baseline while it
+# runs; it finishes later instead (benchmarks/scoring.py).
+BACKFILLS = {
+    "leads_fts": (index_range, 2000, 0.05),
+    "lead_stats": (count_range, 2000, 0.05),
+    "created_ts": (fill_created_ts, 2000, 0.05),
+    "priority_score": (rescore_range, 500, 0.025),
+}
+
+def user_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def apply_migrations(conn):
+    # Runs inside BEGIN IMMEDIATE: the database write lock doubles as the migration
+    # lock, so a worker that waited re-reads the version here and finds nothing to do
+    current = user_version(conn)
+    for version, step in MIGRATIONS:
+        if version > current:
+            step(conn)
+    if current < LATEST:
+        conn.execute(f"PRAGMA user_version = {LATEST}")
+    return current
+
+def migrate(db, wait=600):
+    # Normal startup: a single pragma read. Otherwise one worker migrates while the rest
+    # wait for it; a big upgrade (index builds) can outlast busy_timeout, so "database
+    # is locked" means try again until the version is current, for up to `wait` seconds.
+    if db.read_sync(user_version) >= LATEST:
+        return False
+    deadline = time.monotonic() + wait
+    while True:
+        try:
+            return db.write_sync(apply_migrations) < LATEST
+        except sqlite3.OperationalError as e:
+            if ("locked" not in str(e) and "busy" not in str(e)) or time.monotonic() > deadline:
+                raise
+        if db.read_sync(user_version) >= LATEST:
+            return False
+        time.sleep(0.5)
+
+def backfill_step(conn, min_chunk=0):
+    job = conn.execute("SELECT name, cursor, until_id FROM backfills ORDER BY name LIMIT 1").fetchone()
+    if job is None:
+        return None
+    name, cursor, until_id = job
+    fn, chunk, _ = BACKFILLS[name]
+    end = min(cursor + max(chunk, min_chunk), until_id)
+    fn(conn, cursor, end)
+    if end >= until_id:
+        conn.execute("DELETE FROM backfills WHERE name = ?", (name,))
+    else:
+        conn.execute("UPDATE backfills SET cursor = ? WHERE name = ?", (end, name))
+    return name
+
+def backfills_pending(conn):
+    return conn.execute("SELECT 1 FROM backfills LIMIT 1").fetchone() is not None
+
+async def run_backfills(db):
+    # Usually there is nothing to do, which a reader can tell without the write lock.
+    # Otherwise one short write transaction per chunk; intake gets the writer in between.
+    if not await db.read(backfills_pending):
+        return
+    while (name := await db.write(backfill_step)) is not None:
+        await asyncio.sleep(BACKFILLS[name][2])
+
+def run_backfills_sync(db, min_chunk=20000):
+    # Offline (manage.py): nothing to yield to, so chunks are larger
+    while db.write_sync(backfill_step, min_chunk) is not None:
+        pass
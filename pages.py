@@ -0,0 +1,71 @@
+# Prebuilt HTML page responses: compressed once, then served per Accept-Encoding with ETags
+
+import gzip
+import hashlib
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Server preference when the client accepts several encodings equally
+PREFERRED = ("br", "gzip", "identity")
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def accepted_encodings(header):
+    accepted = {"identity": 1.0}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name] = q
+    return accepted
+
+def negotiate(header, available):
+    accepted = accepted_encodings(header or "")
+    wildcard = accepted.get("*")
+    best, best_q = "identity", 0.0
+    for encoding in PREFERRED:
+        if encoding not in available:
+            continue
+        q = accepted.get(encoding, wildcard if wildcard is not None else 0.0)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+class StaticPage:
+    def __init__(self, html, cache_control):
+        body = html.encode()
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        self.cache_control = cache_control
+        # Strong ETags must differ per encoding, since the bytes differ
+        self.variants = {
+            "identity": (body, f'"{digest}"'),
+            "gzip": (gzip.compress(body, 9, mtime=0), f'"{digest}-gz"'),
+        }
+        if brotli is not None:
+            self.variants["br"] = (brotli.compress(body, quality=11), f'"{digest}-br"')
+
+    def response(self, request):
+        encoding = negotiate(request.headers.get("accept-encoding"), self.variants)
+        body, etag = self.variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(body, media_type="text/html; charset=utf-8", headers=headers)
@@ -0,0 +1,27 @@
+# Schema helpers shared by the migrations: column checks and chunked background backfills
+
+def columns(conn, table):
+    # table_xinfo also lists generated columns, which table_info hides
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+def add_column(conn, table, definition):
+    if definition.split()[0] not in columns(conn, table):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN {definition}")
+
+def schedule_backfill(conn, name):
+    # Rows up to the current high-water mark are processed later in chunks
+    # (migrations.run_backfills); rows inserted from now on are handled by triggers
+    until_id = conn.execute("SELECT coalesce(max(id), 0) FROM leads").fetchone()[0]
+    if until_id:
+        conn.execute("INSERT OR REPLACE INTO backfills (name, cursor, until_id) VALUES (?, 0, ?)", (name, until_id))
+
+def not_pending(name, ref):
+    # Trigger guard: true unless row `ref` is still waiting for backfill `name`,
+    # in which case the backfill will pick up its current values instead
+    return f"""NOT EXISTS (
+        SELECT 1 FROM backfills WHERE name = '{name}' AND {ref} > cursor AND {ref} <= until_id
+    )"""
+
+def archiving():
+    # Trigger guard: true while archive.purge_chunk is moving rows to the archive database
+    return "(SELECT active FROM archive_state WHERE id = 1)"
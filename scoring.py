@@ -0,0 +1,132 @@
+# Lead priority: who to call first, as one integer stored in leads.priority_score
+#
+# Scorer.score() runs at intake; Scorer.sql() is the same formula as a SQL expression,
+# used to re-score stored leads in bulk when the weights change. Keywords match as
+# substrings of the issue text, case-insensitively for ASCII only on both sides
+# (SQLite's lower() folds nothing else), so the two always agree.
+
+import json
+import string
+from functools import lru_cache
+from archive import create_archive
+from schema import add_column, schedule_backfill
+
+# Points per field value; anything not listed (or blank) scores 0
+DEFAULT_WEIGHTS = {
+    "urgency": {"Emergency": 100, "Soon": 50, "Routine": 0},
+    "intent": {"Ready to schedule": 40, "Not sure yet": 10, "Just looking for an estimate": 0},
+    # Earlier in the shop's day means it can still be reached today
+    "contact_time": {"Morning": 10, "Afternoon": 5, "Evening": 0},
+    "keywords": {
+        "slipping": 25, "burning smell": 30, "smoke": 30, "overheating": 30, "won't shift": 25,
+        "wont shift": 25, "no reverse": 25, "stalls": 20, "leaking": 15, "grinding": 15,
+        "check engine": 10, "noise": 5,
+    },
+}
+
+SECTIONS = ("urgency", "intent", "contact_time", "keywords")
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+def load_weights(path=None):
+    # A JSON file may replace any section of DEFAULT_WEIGHTS; points must be integers
+    weights = dict(DEFAULT_WEIGHTS)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            overrides = json.load(f)
+        unknown = set(overrides) - set(SECTIONS)
+        if unknown:
+            raise ValueError(f"Unknown scoring sections: {', '.join(sorted(unknown))}")
+        weights.update(overrides)
+    return {section: {str(k): int(v) for k, v in weights[section].items()} for section in SECTIONS}
+
+def literal(value):
+    return "'" + value.replace("'", "''") + "'"
+
+class Scorer:
+    def __init__(self, weights=DEFAULT_WEIGHTS):
+        self.weights = weights
+        # Stored in scoring_state; a different one there means stored scores are stale
+        self.fingerprint = json.dumps(weights, sort_keys=True)
+        self.keywords = [(k.translate(ASCII_LOWER), v) for k, v in weights["keywords"].items()]
+
+    def score(self, lead):
+        w = self.weights
+        issues = (lead.get("issues") or "").translate(ASCII_LOWER)
+        return (w["urgency"].get(lead.get("urgency"), 0) + w["intent"].get(lead.get("intent"), 0)
+                + w["contact_time"].get(lead.get("contact_time"), 0)
+                + sum(points for keyword, points in self.keywords if keyword in issues))
+
+    def sql(self, issues="lower(issues)"):
+        # issues: the lowercased issue text, for callers that have it already
+        terms = []
+        for column in ("urgency", "intent", "contact_time"):
+            cases = " ".join(f"WHEN {literal(k)} THEN {v}" for k, v in self.weights[column].items() if v)
+            if cases:
+                terms.append(f"CASE {column} {cases} ELSE 0 END")
+        terms += [f"(instr({issues}, {literal(k)}) > 0) * {v}" for k, v in self.keywords if v]
+        return " + ".join(terms) or "0"
+
+@lru_cache(maxsize=4)
+def stored_scorer(fingerprint):
+    return Scorer(json.loads(fingerprint))
+
+def create_scoring(conn):
+    add_column(conn, "leads", "priority_score INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_priority ON leads (priority_score, id)")
+    # Weights the stored scores were computed with; set by sync_weights at startup
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS scoring_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            weights TEXT
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO scoring_state (id, weights) VALUES (1, NULL)")
+    create_archive(conn)
+
+def weights_changed(conn, scorer):
+    # Cheap enough for a reader at startup; sync_weights checks again under the write lock
+    return conn.execute("SELECT weights FROM scoring_state WHERE id = 1").fetchone()[0] != scorer.fingerprint
+
+def sync_weights(conn, scorer):
+    # New weights: record them and re-score every stored lead in the background
+    # (rescore_range via run_backfills); leads arriving meanwhile are scored at intake
+    if not weights_changed(conn, scorer):
+        return False
+    conn.execute("UPDATE scoring_state SET weights = ? WHERE id = 1", (scorer.fingerprint,))
+    schedule_backfill(conn, "priority_score")
+    return True
+
+def rescore_range(conn, after_id, until_id):
+    # One UPDATE per chunk, evaluated inside SQLite with the formula computed once per
+    # row; unchanged rows are not written. The chunk is materialized with the issue text
+    # lowercased once, not once per keyword (flattening would repeat lower()).
+    fingerprint = conn.execute("SELECT weights FROM scoring_state WHERE id = 1").fetchone()[0]
+    if fingerprint is None:
+        return
+    conn.execute(f"""
+        WITH chunk AS MATERIALIZED (
+            SELECT id, urgency, intent, contact_time, lower(issues) AS issues_lower
+            FROM leads WHERE id > ? AND id <= ?
+        )
+        UPDATE leads SET priority_score = s.score
+        FROM (SELECT id, {stored_scorer(fingerprint).sql("issues_lower")} AS score FROM chunk) AS s
+        WHERE leads.id = s.id AND leads.priority_score IS NOT s.score
+    """, (after_id, until_id))
+
+def select_by_score(conn, columns, limit=50, before_score=None, before_id=None):
+    # Highest score first, newest first among equals; the cursor is the last row's
+    # (priority_score, id). Leads not scored yet (mid re-score) are left out.
+    where, args = ["priority_score IS NOT NULL"], []
+    if before_score is not None and before_id is not None:
+        where.append("(priority_score, id) < (?, ?)")
+        args += [before_score, before_id]
+    cursor = conn.execute(f"""
+        SELECT {columns}
+        FROM leads INDEXED BY idx_leads_priority
+        WHERE {" AND ".join(where)}
+        ORDER BY priority_score DESC, id DESC
+        LIMIT ?
+    """, (*args, limit))
+    cursor.row_factory = None
+    return [d[0] for d in cursor.description], cursor.fetchall()
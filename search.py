@@ -0,0 +1,86 @@
+# Full-text search over leads (SQLite FTS5, kept in sync with the leads table by triggers)
+
+import re
+from schema import not_pending, schedule_backfill
+
+FTS_COLUMNS = ("issues", "vehicle", "name", "phone", "email")
+
+# bm25 weights, in FTS_COLUMNS order: the issue text and vehicle matter most
+WEIGHTS = "8.0, 6.0, 4.0, 2.0, 1.0"
+
+def create_search_index(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'leads_fts'").fetchone()
+    cols = ", ".join(FTS_COLUMNS)
+    new = ", ".join("new." + c for c in FTS_COLUMNS)
+    old = ", ".join("old." + c for c in FTS_COLUMNS)
+    # External content table: the index stores tokens only, rows stay in leads
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+            {cols},
+            content='leads', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        )
+    """)
+    for trigger in ("leads_fts_insert", "leads_fts_delete", "leads_fts_update"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"""
+        CREATE TRIGGER leads_fts_insert AFTER INSERT ON leads BEGIN
+            INSERT INTO leads_fts (rowid, {cols}) VALUES (new.id, {new});
+        END
+    """)
+    # Rows not yet reached by the backfill are not in the index, so there is nothing to remove
+    conn.execute(f"""
+        CREATE TRIGGER leads_fts_delete AFTER DELETE ON leads
+        WHEN {not_pending("leads_fts", "old.id")} BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER leads_fts_update AFTER UPDATE OF {cols} ON leads
+        WHEN {not_pending("leads_fts", "old.id")} BEGIN
+            INSERT INTO leads_fts (leads_fts, rowid, {cols}) VALUES ('delete', old.id, {old});
+            INSERT INTO leads_fts (rowid, {cols}) VALUES (new.id, {new});
+        END
+    """)
+    if not exists:
+        # Index the leads that were there before the search index, in the background
+        schedule_backfill(conn, "leads_fts")
+
+def index_range(conn, after_id, until_id):
+    cols = ", ".join(FTS_COLUMNS)
+    conn.execute(f"""
+        INSERT INTO leads_fts (rowid, {cols})
+        SELECT id, {cols} FROM leads WHERE id > ? AND id <= ?
+    """, (after_id, until_id))
+
+def match_query(text):
+    # Every word must match, each as a prefix: "camr grind" finds "Camry ... grinding".
+    # Words are quoted, so FTS5 operators in user input are treated as plain text.
+    words = re.findall(r"\w+", text.lower())
+    return " ".join(f'"{w}"*' for w in words)
+
+def search_leads(conn, columns, q, urgency=None, status=None, since=None, until=None, limit=25):
+    where, args = ["leads_fts MATCH ?"], [match_query(q)]
+    if urgency:
+        where.append("l.urgency = ?")
+        args.append(urgency)
+    if status:
+        where.append("l.status = ?")
+        args.append(status)
+    # created_at is "YYYY-MM-DD HH:MM:SS", so dates compare as strings
+    if since:
+        where.append("l.created_at >= ?")
+        args.append(since)
+    if until:
+        where.append("l.created_at < ?")
+        args.append(until)
+    select = ", ".join("l." + c for c in columns)
+    rows = conn.execute(f"""
+        SELECT {select}, bm25(leads_fts, {WEIGHTS}) AS rank
+        FROM leads_fts
+        JOIN leads l ON l.id = leads_fts.rowid
+        WHERE {" AND ".join(where)}
+        ORDER BY rank
+        LIMIT ?
+    """, (*args, limit)).fetchall()
+    return [dict(r) for r in rows]
@@ -0,0 +1,46 @@
+# Fast response encoding for lead lists: rows go straight from the cursor to bytes
+#
+# orjson and msgpack are optional. Without orjson the stdlib encoder produces the same
+# bytes FastAPI's JSONResponse would; without msgpack, Accept: application/msgpack
+# simply gets JSON.
+
+import json
+from pages import accepted_encodings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def stdlib_json(value):
+    # Same settings as starlette's JSONResponse.render
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+MEDIA_TYPES = {"json": "application/json"}
+ENCODERS = {"json": orjson.dumps if orjson is not None else stdlib_json}
+if msgpack is not None:
+    MEDIA_TYPES["msgpack"] = "application/msgpack"
+    ENCODERS["msgpack"] = msgpack.packb
+
+# records: [{"id": 1, ...}, ...]   columns: {"columns": ["id", ...], "rows": [[1, ...], ...]}
+SHAPES = ("records", "columns")
+
+def negotiate_media(accept):
+    # MessagePack only when asked for and preferred at least as much as JSON
+    if "msgpack" not in ENCODERS or not accept:
+        return "json"
+    accepted = accepted_encodings(accept)
+    q = max(accepted.get("application/msgpack", 0.0), accepted.get("application/x-msgpack", 0.0))
+    return "msgpack" if q > 0 and q >= accepted.get("application/json", 0.0) else "json"
+
+def encode_rows(names, rows, shape="records", encoder=ENCODERS["json"]):
+    # rows are plain tuples (see main.select_leads): no sqlite3.Row objects, no per-value
+    # walk by a generic encoder
+    if shape == "columns":
+        return encoder({"columns": names, "rows": rows})
+    return encoder([dict(zip(names, r)) for r in rows])
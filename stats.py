@@ -0,0 +1,129 @@
+# Dashboard aggregates, maintained by triggers in the same transaction as each lead change
+
+from schema import archiving, not_pending, schedule_backfill
+
+# (dimension, SQL expression over a leads row); "row." is replaced by new./old. in triggers
+DIMENSIONS = (
+    ("urgency", "row.urgency"),
+    ("status", "row.status"),
+    ("intent", "coalesce(row.intent, '')"),
+    ("contact_method", "coalesce(row.contact_method, '')"),
+    ("day", "substr(row.created_at, 1, 10)"),
+    ("hour", "substr(row.created_at, 12, 2)"),
+)
+
+UPSERT = "ON CONFLICT (dimension, key) DO UPDATE SET count = count + excluded.count"
+
+def _values(prefix, delta):
+    values = [f"('total', '', {delta})"]
+    values += [f"('{name}', {expr.replace('row.', prefix)}, {delta})" for name, expr in DIMENSIONS]
+    return ", ".join(values)
+
+def create_stats(conn):
+    exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'lead_stats'").fetchone()
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS lead_stats (
+            dimension TEXT NOT NULL,
+            key TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            PRIMARY KEY (dimension, key)
+        ) WITHOUT ROWID
+    """)
+    for trigger in ("lead_stats_insert", "lead_stats_delete", "lead_stats_status"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute(f"""
+        CREATE TRIGGER lead_stats_insert AFTER INSERT ON leads BEGIN
+            INSERT INTO lead_stats (dimension, key, count) VALUES {_values("new.", 1)} {UPSERT};
+        END
+    """)
+    # Rows the backfill has not counted yet must not be uncounted either
+    conn.execute(f"""
+        CREATE TRIGGER lead_stats_delete AFTER DELETE ON leads
+        WHEN {not_pending("lead_stats", "old.id")} BEGIN
+            INSERT INTO lead_stats (dimension, key, count) VALUES {_values("old.", -1)} {UPSERT};
+        END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER lead_stats_status AFTER UPDATE OF status ON leads
+        WHEN old.status IS NOT new.status AND {not_pending("lead_stats", "old.id")} BEGIN
+            INSERT INTO lead_stats (dimension, key, count) VALUES ('status', old.status, -1), ('status', new.status, 1) {UPSERT};
+        END
+    """)
+    if not exists:
+        schedule_backfill(conn, "lead_stats")
+
+def keep_archived_counts(conn):
+    # Archived leads still count: deletes made while archive.purge_chunk is moving rows
+    # out of the hot table leave the aggregates alone
+    conn.execute("DROP TRIGGER IF EXISTS lead_stats_delete")
+    conn.execute(f"""
+        CREATE TRIGGER lead_stats_delete AFTER DELETE ON leads
+        WHEN {not_pending("lead_stats", "old.id")} AND NOT {archiving()} BEGIN
+            INSERT INTO lead_stats (dimension, key, count) VALUES {_values("old.", -1)} {UPSERT};
+        END
+    """)
+
+def track_merged_fields(conn):
+    # A duplicate merge (dedupe.merge_duplicate) fills in a blank intent or contact
+    # method, which moves the lead from the '' key to the real one
+    conn.execute("DROP TRIGGER IF EXISTS lead_stats_fields")
+    conn.execute(f"""
+        CREATE TRIGGER lead_stats_fields AFTER UPDATE OF intent, contact_method ON leads
+        WHEN (old.intent IS NOT new.intent OR old.contact_method IS NOT new.contact_method)
+          AND {not_pending("lead_stats", "old.id")} BEGIN
+            INSERT INTO lead_stats (dimension, key, count) VALUES
+                ('intent', coalesce(old.intent, ''), -1), ('intent', coalesce(new.intent, ''), 1),
+                ('contact_method', coalesce(old.contact_method, ''), -1), ('contact_method', coalesce(new.contact_method, ''), 1)
+            {UPSERT};
+        END
+    """)
+
+def count_range(conn, after_id, until_id):
+    # Adds the counts for leads in (after_id, until_id]; used by the background backfill
+    dimensions = (("total", "''"),) + tuple((name, expr.replace("row.", "")) for name, expr in DIMENSIONS)
+    for name, expr in dimensions:
+        conn.execute(f"""
+            INSERT INTO lead_stats (dimension, key, count)
+            SELECT '{name}', {expr}, count(*) FROM leads WHERE id > ? AND id <= ? GROUP BY {expr}
+            {UPSERT}
+        """, (after_id, until_id))
+
+# Every lead once: the hot table plus archived rows that are not also still hot (archive.py)
+ALL_LEADS = """(
+    SELECT urgency, status, intent, contact_method, created_at FROM main.leads
+    UNION ALL
+    SELECT urgency, status, intent, contact_method, created_at FROM archive.leads a
+    WHERE NOT EXISTS (SELECT 1 FROM main.leads h WHERE h.id = a.id)
+)"""
+
+def rebuild_stats(conn):
+    # Recompute everything from the leads, archived ones included since they still
+    # count, e.g. after a manual edit caused drift
+    conn.execute("DELETE FROM lead_stats")
+    conn.execute("DELETE FROM backfills WHERE name = 'lead_stats'")
+    conn.execute(f"INSERT INTO lead_stats (dimension, key, count) SELECT 'total', '', count(*) FROM {ALL_LEADS}")
+    for name, expr in DIMENSIONS:
+        expr = expr.replace("row.", "")
+        conn.execute(f"""
+            INSERT INTO lead_stats (dimension, key, count)
+            SELECT '{name}', {expr}, count(*) FROM {ALL_LEADS} GROUP BY {expr}
+        """)
+    return conn.execute("SELECT count FROM lead_stats WHERE dimension = 'total'").fetchone()[0]
+
+def read_stats(conn, days=30):
+    stats = {"total": 0}
+    rows = conn.execute("SELECT dimension, key, count FROM lead_stats WHERE dimension != 'day' AND count != 0")
+    for dimension, key, count in rows:
+        if dimension == "total":
+            stats["total"] = count
+        else:
+            stats.setdefault("by_" + dimension, {})[key] = count
+    # Days keep accumulating, so only the most recent ones are returned
+    rows = conn.execute("""
+        SELECT key, count FROM lead_stats
+        WHERE dimension = 'day' AND count != 0
+        ORDER BY key DESC
+        LIMIT ?
+    """, (days,)).fetchall()
+    stats["by_day"] = {key: count for key, count in reversed(rows)}
+    return stats
@@ -0,0 +1,148 @@
+# Multi-location tenancy: each shop has its own SQLite file, writer thread, live feed and pages
+#
+# TENANTS_FILE points at a JSON file such as
+#
+#   {"tenants": [
+#     {"slug": "tyler", "db": "data/tyler.db", "hosts": ["tyler.example.com"], "prefix": "/tyler",
+#      "default": true, "shop": {"name": "AAMCO Tyler", "city": "Tyler", "phone": "(903) 415-5772", ...}},
+#     {"slug": "longview", "prefix": "/longview", "archive": "cold/longview.db", "shop": {...},
+#      "notify": {"sms": ["+19035550100"], "email": ["service@longview.example.com"]}}
+#   ]}
+#
+# Without it there is a single "default" tenant on LEADS_DB, which is how the app always ran.
+# Archived leads go to "archive" (LEADS_ARCHIVE_DB), by default next to the database as <name>-archive.db.
+# "notify" lists who is alerted about urgent leads, per channel (NOTIFY_SMS_TO / NOTIFY_EMAIL_TO).
+
+import json
+import os
+from html import escape
+from urllib.parse import quote
+
+# Page values for the original shop; other locations override them in their "shop" block
+SHOP_DEFAULTS = {
+    "name": "AAMCO Tyler",
+    "city": "Tyler",
+    "state": "TX",
+    "street": "2002 Broussard St",
+    "zip": "75701",
+    "phone": "(903) 415-5772",
+    "tel": "19034155772",
+    "closes": "Closes 5 PM",
+    "reviews": "3.9★ • 128 reviews",
+}
+
+class Tenant:
+    def __init__(self, slug, db_path, hosts=(), prefix=None, shop=None, default=False, archive_path=None,
+                 notify=None):
+        self.slug = slug
+        self.db_path = db_path
+        root, ext = os.path.splitext(db_path)
+        self.archive_path = archive_path or f"{root}-archive{ext or '.db'}"
+        self.hosts = tuple(h.lower() for h in hosts)
+        self.prefix = "/" + prefix.strip("/") if prefix else None
+        self.default = default
+        self.shop = {**SHOP_DEFAULTS, **(shop or {})}
+        self.shop.setdefault("maps_url", "https://www.google.com/maps/search/?api=1&query=" + quote(
+            f"{self.shop['street']}, {self.shop['city']}, {self.shop['state']} {self.shop['zip']}"))
+        # channel -> recipients
+        self.notify = {c: list(r) for c, r in (notify or {}).items() if r}
+        # Set up by main.open_tenant
+        self.db = None
+        self.feed = None
+        self.ingest = None
+        self.dispatcher = None
+        self.pages = {}
+
+class Tenants:
+    def __init__(self, tenants):
+        if not tenants:
+            raise ValueError("No tenants configured")
+        self.all = list(tenants)
+        self.by_slug = {t.slug: t for t in self.all}
+        self.by_host = {h: t for t in self.all for h in t.hosts}
+        self.by_prefix = {t.prefix: t for t in self.all if t.prefix}
+        defaults = [t for t in self.all if t.default]
+        # A lone tenant serves every host; otherwise only an explicit default does
+        self.default = defaults[0] if defaults else (self.all[0] if len(self.all) == 1 else None)
+
+    def __iter__(self):
+        return iter(self.all)
+
+    def get(self, slug=None):
+        tenant = self.default if slug is None else self.by_slug.get(slug)
+        if tenant is None:
+            raise KeyError(slug)
+        return tenant
+
+    def select(self, slugs=None):
+        # "a,b" -> those tenants, in that order; None -> all of them
+        if not slugs:
+            return self.all
+        return [self.by_slug[s] for s in slugs.split(",") if s in self.by_slug]
+
+    def resolve(self, host, path):
+        # Returns (tenant, prefix to strip); hostname wins over path prefix
+        tenant = self.by_host.get(host.rsplit(":", 1)[0].lower()) if host else None
+        if tenant is not None:
+            return tenant, None
+        first = "/" + path.split("/", 2)[1]
+        tenant = self.by_prefix.get(first)
+        if tenant is not None:
+            return tenant, first
+        return self.default, None
+
+def load_tenants(path, default_db, default_archive=None, default_notify=None):
+    if not path:
+        return Tenants([Tenant("default", default_db, default=True, archive_path=default_archive,
+                               notify=default_notify)])
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    return Tenants([
+        Tenant(t["slug"], t.get("db") or f"leads-{t['slug']}.db", hosts=t.get("hosts", ()),
+               prefix=t.get("prefix"), shop=t.get("shop"), default=t.get("default", False),
+               archive_path=t.get("archive"), notify=t.get("notify"))
+        for t in config["tenants"]
+    ])
+
+def render(html, shop):
+    # {{key}} placeholders rather than string.Template, which would trip over JS `${...}`
+    for key, value in shop.items():
+        html = html.replace("{{" + key + "}}", escape(str(value)))
+    return html
+
+class TenantRouter:
+    # Pure ASGI: picks the tenant by Host header, then by first path segment, and puts it
+    # on request.state.tenant. A matched prefix becomes part of root_path, so routes are
+    # declared once ("/api/leads") and serve "/tyler/api/leads" as well.
+    def __init__(self, app, tenants, shared=()):
+        self.app = app
+        self.tenants = tenants
+        # Paths served without a tenant, e.g. the cross-location API
+        self.shared = tuple(shared)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        path = scope["path"]
+        if path.startswith(self.shared):
+            return await self.app(scope, receive, send)
+        host = next((v.decode("latin-1") for k, v in scope["headers"] if k == b"host"), "")
+        tenant, prefix = self.tenants.resolve(host, path)
+        if tenant is None:
+            return await self.reply(send, 404, b'{"ok": false, "error": "Unknown location"}',
+                                    [(b"content-type", b"application/json")])
+        if prefix:
+            if path == prefix:
+                # Pages use relative links, which only resolve under the trailing slash
+                query = scope.get("query_string", b"")
+                location = (prefix + "/").encode() + (b"?" + query if query else b"")
+                return await self.reply(send, 307, b"", [(b"location", location)])
+            scope["root_path"] = scope.get("root_path", "") + prefix
+        scope.setdefault("state", {})["tenant"] = tenant
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    async def reply(send, status, body, headers):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": headers + [(b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,157 @@
+# Streaming export and batched bulk import of leads (NDJSON and CSV)
+
+import csv
+import io
+import json
+import sqlite3
+from datetime import datetime
+from leads import LEAD_COLUMNS, TIME_FORMAT, clean_lead, lead_values, now
+from triage import TRANSITIONS
+
+FIELDS = LEAD_COLUMNS.split(", ")
+
+CHUNK_SIZE = 1000
+IMPORT_BATCH = 5000
+
+# Spreadsheets run a cell that starts with one of these as a formula, and the text comes
+# from the public form. Exports meant for a spreadsheet (?spreadsheet=1) give such cells a
+# leading ' (stripped again on import). Plain CSV is left alone: a CRM import would keep
+# the ', e.g. on every +1... phone number.
+FORMULA_START = ("=", "+", "-", "@", "\t", "\r")
+
+def fetch_chunk(conn, after_id, until_id=None, start=None, end=None, size=CHUNK_SIZE, archived=False):
+    # Keyset scan on the primary key: each chunk is one short read, memory stays flat
+    where, args = ["id > ?"], [after_id]
+    if until_id is not None:
+        where.append("id <= ?")
+        args.append(until_id)
+    if start:
+        where.append("created_at >= ?")
+        args.append(start)
+    if end:
+        where.append("created_at < ?")
+        args.append(end)
+    rows = conn.execute(f"""
+        SELECT {LEAD_COLUMNS}
+        FROM main.leads
+        WHERE {" AND ".join(where)}
+        ORDER BY id
+        LIMIT ?
+    """, (*args, size)).fetchall()
+    if archived:
+        # Same scan over the archive database, minus rows that are still hot (see archive.py)
+        rows += conn.execute(f"""
+            SELECT {LEAD_COLUMNS}
+            FROM archive.leads a
+            WHERE {" AND ".join(where)} AND NOT EXISTS (SELECT 1 FROM main.leads h WHERE h.id = a.id)
+            ORDER BY id
+            LIMIT ?
+        """, (*args, size)).fetchall()
+        rows = sorted(rows, key=lambda r: r["id"])[:size]
+    return rows
+
+def csv_cell(value):
+    if isinstance(value, str) and value.startswith(FORMULA_START):
+        return "'" + value
+    return value
+
+def csv_value(value):
+    # Undoes csv_cell, so an export imports back unchanged
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_START):
+        return value[1:]
+    return value
+
+def csv_line(values):
+    buf = io.StringIO()
+    csv.writer(buf).writerow(values)
+    return buf.getvalue()
+
+async def export_leads(db, fmt, since_id=0, until_id=None, start=None, end=None, archived=False, spreadsheet=False):
+    if fmt == "csv":
+        yield csv_line(FIELDS)
+    after = since_id or 0
+    while True:
+        rows = await db.read(fetch_chunk, after, until_id, start, end, CHUNK_SIZE, archived)
+        if not rows:
+            return
+        if fmt == "csv":
+            buf = io.StringIO()
+            csv.writer(buf).writerows([csv_cell(v) for v in r] if spreadsheet else r for r in rows)
+            yield buf.getvalue()
+        else:
+            yield "".join(json.dumps(dict(r)) + "\n" for r in rows)
+        after = rows[-1]["id"]
+
+def read_records(lines, fmt):
+    # lines: an iterable of text lines, e.g. an open file. A record that cannot be
+    # parsed comes out as a ValueError, so the import rejects it and carries on.
+    if fmt == "csv":
+        reader = csv.DictReader(lines)
+        while True:
+            try:
+                record = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # E.g. a field over the size limit; the reader resumes at the next line
+                yield ValueError(f"Invalid CSV: {e}")
+                continue
+            yield {k: csv_value(v) for k, v in record.items()}
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield ValueError("Invalid JSON")
+
+def import_values(record, score=None):
+    lead = clean_lead(record)
+    if score is not None:
+        lead["priority_score"] = score(lead)
+    # History keeps its original timestamp and status; anything else is treated as new
+    created_at = record.get("created_at")
+    created_at = datetime.fromisoformat(str(created_at).strip()).strftime(TIME_FORMAT) if created_at else now()
+    status = str(record.get("status") or "").strip() or "new"
+    if status not in TRANSITIONS:
+        raise ValueError(f"Unknown status: {status[:40]}")
+    return (status, *lead_values(lead, created_at))
+
+IMPORT_LEAD = """
+    INSERT INTO leads (status, created_at, created_ts, name, phone, email, vehicle, urgency, issues, contact_method,
+                       contact_time, intent, priority_score)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+def insert_batch(conn, rows):
+    conn.executemany(IMPORT_LEAD, rows)
+    return len(rows)
+
+def import_leads(db, lines, fmt, batch_size=IMPORT_BATCH, score=None):
+    # Blocking: call from a worker thread or the CLI. Each batch is its own write
+    # transaction, so regular intake interleaves between batches. score(lead) sets
+    # priority_score (main.SCORER.score). Open lines with errors="replace": a bad byte
+    # then only rejects its own record.
+    imported, rejected, errors = 0, 0, []
+    batch = []
+    try:
+        for n, record in enumerate(read_records(lines, fmt), 1):
+            try:
+                if isinstance(record, ValueError):
+                    raise record
+                batch.append(import_values(record, score))
+            except ValueError as e:
+                rejected += 1
+                if len(errors) < 20:
+                    errors.append({"record": n, "error": str(e)})
+                continue
+            if len(batch) >= batch_size:
+                imported += db.write_sync(insert_batch, batch)
+                batch = []
+        if batch:
+            imported += db.write_sync(insert_batch, batch)
+    except (UnicodeDecodeError, csv.Error, sqlite3.Error) as e:
+        # Earlier batches stay committed; report them along with why the import stopped
+        return {"imported": imported, "rejected": rejected, "errors": errors, "stopped": str(e)}
+    return {"imported": imported, "rejected": rejected, "errors": errors}
@@ -0,0 +1,79 @@
+# Triage work queue: status transitions with optimistic concurrency and atomic claims
+
+from leads import LEAD_COLUMNS, now
+from schema import add_column
+
+# Allowed moves; any open lead can also be closed directly
+TRANSITIONS = {
+    "new": ("contacted", "closed"),
+    "contacted": ("scheduled", "closed"),
+    "scheduled": ("closed",),
+    "closed": (),
+}
+
+class Conflict(Exception):
+    def __init__(self, message, lead=None):
+        super().__init__(message)
+        self.lead = lead
+
+def create_triage(conn):
+    for column in (
+        "version INTEGER NOT NULL DEFAULT 0",
+        "claimed_by TEXT",
+        "claimed_at TEXT",
+        # Emergency -> Soon -> Routine, as a sortable integer for the queue index
+        "urgency_rank INTEGER GENERATED ALWAYS AS "
+        "(CASE urgency WHEN 'Emergency' THEN 0 WHEN 'Soon' THEN 1 ELSE 2 END) VIRTUAL",
+    ):
+        add_column(conn, "leads", column)
+    # Partial index: closed leads never enter it, so the queue stays small however many pile up
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_leads_queue
+        ON leads (urgency_rank, id, claimed_by) WHERE status != 'closed'
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_leads_status ON leads (status, urgency, id)")
+
+def fetch_queue(conn, limit=50, unclaimed=False):
+    rows = conn.execute(f"""
+        SELECT {LEAD_COLUMNS}
+        FROM leads INDEXED BY idx_leads_queue
+        WHERE status != 'closed' {"AND claimed_by IS NULL" if unclaimed else ""}
+        ORDER BY urgency_rank, id
+        LIMIT ?
+    """, (limit,)).fetchall()
+    return [dict(r) for r in rows]
+
+def claim_next(conn, advisor):
+    # Runs on the single writer thread, so two advisors can never get the same lead
+    row = conn.execute(f"""
+        UPDATE leads SET claimed_by = ?, claimed_at = ?, version = version + 1
+        WHERE id = (
+            SELECT id FROM leads INDEXED BY idx_leads_queue
+            WHERE status != 'closed' AND status = 'new' AND claimed_by IS NULL
+            ORDER BY urgency_rank, id
+            LIMIT 1
+        )
+        RETURNING {LEAD_COLUMNS}
+    """, (advisor, now())).fetchone()
+    return dict(row) if row else None
+
+def current_lead(conn, lead_id):
+    row = conn.execute(f"SELECT {LEAD_COLUMNS} FROM leads WHERE id = ?", (lead_id,)).fetchone()
+    return dict(row) if row else None
+
+def change_status(conn, lead_id, status, version, advisor=None):
+    lead = current_lead(conn, lead_id)
+    if lead is None:
+        raise KeyError(lead_id)
+    if lead["version"] != version:
+        raise Conflict("Lead was changed by someone else", lead)
+    if status not in TRANSITIONS.get(lead["status"], ()):
+        raise Conflict(f"Cannot move a {lead['status']} lead to {status}", lead)
+    row = conn.execute(f"""
+        UPDATE leads
+        SET status = ?, version = version + 1, claimed_by = coalesce(?, claimed_by),
+            claimed_at = CASE WHEN ? IS NULL THEN claimed_at ELSE ? END
+        WHERE id = ? AND version = ?
+        RETURNING {LEAD_COLUMNS}
+    """, (status, advisor, advisor, now(), lead_id, version)).fetchone()
+    return dict(row)